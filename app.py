@@ -1,14 +1,180 @@
 from flask import Flask, render_template, request, redirect, url_for, session, abort, flash, make_response
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Response, stream_with_context
 from werkzeug.exceptions import Forbidden
+import os
 import secrets
+import time
 import db
+import images
+from signature_writer import SignatureWriter, WriterBusy, SIGN, UNSIGN
+from search import search_initiatives
+from pagination import paginate
+from summary import summarize
+from live import CountNotifier, LiveBusy
+from deadlines import DeadlineSweeper
+from cache import FragmentCache, RoleCache
+from hashing import PasswordHasher, HasherBusy, DEFAULT_METHOD
+from markupsafe import Markup
 import sqlite3
-import os
+import logging
+import csv
+import datetime
+import io
+import json
+import click
+from contextlib import nullcontext
 from functools import wraps
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)  # keep secret in production
+
+# Defaults. Every setting can be overridden in the Python file named by
+# FLASK_CONFIG_FILE or with a FLASK_ environment variable, e.g.
+# FLASK_SECRET_KEY=... or FLASK_SQLITE_POOL_SIZE=16 (see create_app)
+app.config.update(
+    # Signs the session cookie: must be the same in every worker process and
+    # on every node. Without one a random key is generated per process.
+    SECRET_KEY=None,
+    REQUIRE_SECRET_KEY=False,
+    # SQLite database; a relative path is relative to this directory, not to
+    # the working directory
+    DATABASE="database.db",
+    # Group commit for signatures: FLASK_SIGNATURE_BATCHING=true queues sign/unsign
+    # requests and writes them in batched transactions (see signature_writer.py)
+    SIGNATURE_BATCHING=False,
+    SIGNATURE_BATCH_SIZE=256,
+    SIGNATURE_BATCH_DELAY=0.001,
+    FRAGMENT_CACHE_BYTES=8 * 1024 * 1024,
+    # Password hashing in a process pool (see hashing.py): a Werkzeug method
+    # such as "pbkdf2:sha256:600000" or "bcrypt:12"; WORKERS=0 hashes inline
+    PASSWORD_HASH_METHOD=DEFAULT_METHOD,
+    PASSWORD_HASH_WORKERS=None,
+    PASSWORD_HASH_MAX_PENDING=64,
+    # File for slow statements and N+1 warnings when FLASK_SQLITE_INSTRUMENT=true
+    # (thresholds: FLASK_SQLITE_SLOW_QUERY_MS, FLASK_SQLITE_REPEAT_THRESHOLD)
+    SLOW_QUERY_LOG=None,
+    # Live signature counts (SSE): updates per second and the interval for
+    # noticing writes made by other processes. Each open stream holds a server
+    # thread, so keep LIVE_MAX_STREAMS below the threads per worker
+    # (GUNICORN_THREADS); further viewers get 503 and retry later
+    LIVE_MAX_RATE=2.0,
+    LIVE_POLL_INTERVAL=2.0,
+    LIVE_MAX_STREAMS=8,
+    # Seconds between checks for initiatives past their end date; 0 disables
+    # the sweeper thread (run "flask close-expired" from cron instead)
+    DEADLINE_SWEEP_INTERVAL=60.0,
+)
+
+# Per-process components, built from the configuration by create_app()
+signature_writer = None
+password_hasher = None
+count_notifier = None
+deadline_sweeper = None
+fragment_cache = None  # rendered front page lists, keyed by db.data_version() (see cache.py)
+role_cache = None      # admin flags of users, invalidated through db.roles_version() (see cache.py)
+slow_query_handler = None
+
+
+# --- APPLICATION SETUP ---
+def create_app(config=None):
+    """Configure the application and build its components; returns the app.
+
+    Settings are applied in order: the defaults above, the file named by
+    FLASK_CONFIG_FILE, FLASK_* environment variables and `config`. The routes
+    are registered on the module-level app, so this configures that one
+    instance. It runs at import (flask run, wsgi.py) and can be called again
+    with overrides, e.g. create_app({"DATABASE": path}) in benchmarks.
+    """
+    global signature_writer, password_hasher, count_notifier, deadline_sweeper
+    global fragment_cache, role_cache, slow_query_handler
+
+    if os.environ.get("FLASK_CONFIG_FILE"):
+        app.config.from_envvar("FLASK_CONFIG_FILE")
+    app.config.from_prefixed_env()
+    app.config.from_mapping(config or {})
+
+    if not app.config["SECRET_KEY"]:
+        if app.config["REQUIRE_SECRET_KEY"]:
+            raise RuntimeError("SECRET_KEY is not set: use FLASK_SECRET_KEY or FLASK_CONFIG_FILE")
+        # Sessions last until this process exits and are not shared with other workers
+        app.config["SECRET_KEY"] = secrets.token_hex(16)
+
+    db.DB_FILE = os.path.join(app.root_path, app.config["DATABASE"])
+    db.configure(**app.config.get_namespace("SQLITE_"))
+    if slow_query_handler is not None:
+        db.slow_query_log.removeHandler(slow_query_handler)
+        slow_query_handler = None
+    if app.config["SLOW_QUERY_LOG"]:
+        slow_query_handler = logging.FileHandler(app.config["SLOW_QUERY_LOG"])
+        slow_query_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        db.slow_query_log.addHandler(slow_query_handler)
+
+    # The previous components' threads and pools work on the old settings
+    # (e.g. DATABASE): stop them before replacing the components
+    for component in (signature_writer, password_hasher, count_notifier, deadline_sweeper):
+        if component is not None:
+            component.close()
+    signature_writer = SignatureWriter(
+        max_batch=app.config["SIGNATURE_BATCH_SIZE"],
+        max_delay=app.config["SIGNATURE_BATCH_DELAY"],
+    )
+    password_hasher = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+    )
+    count_notifier = CountNotifier(
+        max_rate=app.config["LIVE_MAX_RATE"],
+        poll_interval=app.config["LIVE_POLL_INTERVAL"],
+        max_streams=app.config["LIVE_MAX_STREAMS"],
+    )
+    deadline_sweeper = DeadlineSweeper(interval=app.config["DEADLINE_SWEEP_INTERVAL"])
+    fragment_cache = FragmentCache(app.config["FRAGMENT_CACHE_BYTES"])
+    role_cache = RoleCache()
+
+    # Create the database or apply pending schema migrations
+    db.migrate()
+    return app
+
+
+def warm_up():
+    """Prepare a freshly started worker before it takes requests.
+
+    Opens the pooled database connections, compiles every template, loads
+    and renders the default image and starts the deadline sweeper, so the
+    first requests after a deploy do not pay for them. Returns the time
+    spent on each step in milliseconds (gunicorn.conf.py logs them).
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    pool = db.get_pool()
+    connections = [pool.checkout() for _ in range(pool.size)]
+    for con in connections:
+        con.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()  # loads the schema
+    for con in connections:
+        pool.checkin(con)
+    timings["connections"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    timings["templates"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for size in images.VARIANTS:
+        images.default_variant(size)
+    timings["default_image"] = (time.perf_counter() - started) * 1000
+
+    deadline_sweeper.start()
+    return {step: round(ms, 1) for step, ms in timings.items()}
+
+
+create_app()
+
+
+@app.before_request
+def start_deadline_sweeper():
+    deadline_sweeper.start()
 
 
 @app.errorhandler(403)
@@ -18,41 +184,69 @@ def forbidden(e):
     return redirect(request.referrer or url_for("index"))
 
 
+@app.after_request
+def sql_timing(response):
+    # Only with FLASK_SQLITE_INSTRUMENT=true; otherwise db records nothing
+    stats = db.request_stats()
+    if stats is not None:
+        response.headers.add(
+            "Server-Timing", f'db;dur={stats["time_ms"]:.2f};desc="{stats["count"]} statements"'
+        )
+        for sql, count in stats["repeated"].items():
+            db.slow_query_log.warning("%s: %d x %s (N+1?)", request.path, count, sql)
+    return response
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Too many logins queued for the hashing pool: shed load instead of queueing
+    return "Palvelu on ruuhkautunut, yritä hetken kuluttua uudelleen.", 503, {"Retry-After": "1"}
+
+
+@app.errorhandler(WriterBusy)
+def writer_busy(e):
+    # The signature's batch did not commit in time; a retry is safe (idempotent)
+    return "Palvelu on ruuhkautunut, yritä hetken kuluttua uudelleen.", 503, {"Retry-After": "1"}
+
+
+@app.template_global()
+def page_url(param, cursor):
+    """URL of the current view with one pagination cursor replaced."""
+    args = request.args.to_dict()
+    args[param] = cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
 # --- HOME PAGE ---
 @app.route("/")
 def index():
-    # Fetch active initiatives with signature count
-    active = db.query(
-        """
-        SELECT i.id, i.title, u.username, i.image,
-               COUNT(s.id) AS signatures
+    # Active and closed initiatives, newest first, one page each
+    listing = """
+        SELECT i.id, i.title, u.username, i.image_hash, i.created_at,
+               i.signature_count AS signatures
         FROM initiatives i
         JOIN users u ON i.creator_id = u.id
-        LEFT JOIN signatures s ON s.initiative_id = i.id
-        WHERE i.active = 1 AND i.deleted = 0
-        GROUP BY i.id
-        ORDER BY i.created_at DESC
-        """
-    )
-
-    # Fetch inactive initiatives with signature count
-    inactive = db.query(
-        """
-        SELECT i.id, i.title, u.username, i.image,
-               COUNT(s.id) AS signatures
-        FROM initiatives i
-        JOIN users u ON i.creator_id = u.id
-        LEFT JOIN signatures s ON s.initiative_id = i.id
-        WHERE i.active = 0 AND i.deleted = 0
-        GROUP BY i.id
-        ORDER BY i.created_at DESC
-        """
-    )
+        WHERE i.active = ? AND i.deleted = 0
+    """
+
+    # The lists are cached as rendered HTML. Any write that can change them
+    # bumps the data version, so stale fragments are simply never hit again.
+    # Pager links carry all query arguments, hence they are part of the key.
+    version = db.data_version()
+    args = tuple(sorted(request.args.items(multi=True)))
+
+    def render_list(active, param, empty):
+        def render():
+            page = paginate(listing, [active], ("created_at", "id"), request.args.get(param))
+            return Markup(render_template(
+                "_initiative_list.html", page=page, param=param, inactive=not active, empty=empty
+            ))
+        return fragment_cache.get_or_render((param, version, args), render)
 
     return render_template(
         "index.html",
-        active_initiatives=active,
-        inactive_initiatives=inactive
+        active_list=render_list(1, "open", "Ei avoimia aloitteita."),
+        inactive_list=render_list(0, "closed", "Ei suljettuja aloitteita."),
     )
 
 
@@ -88,17 +282,16 @@ def user():
     user = rows[0]
 
     # Käyttäjän aloitteet
-    initiatives = db.query(
+    initiatives = paginate(
         """
-        SELECT i.id, i.title, i.description, i.active, i.image,
-               COUNT(s.id) AS signatures
+        SELECT i.id, i.title, i.description, i.active, i.image_hash, i.created_at,
+               i.signature_count AS signatures
         FROM initiatives i
-        LEFT JOIN signatures s ON s.initiative_id = i.id
         WHERE i.creator_id = ? AND i.deleted = 0
-        GROUP BY i.id
-        ORDER BY i.id DESC
         """,
         [session["user_id"]],
+        ("created_at", "id"),
+        request.args.get("cursor"),
     )
 
     return render_template("user.html", user=user, initiatives=initiatives)
@@ -107,23 +300,10 @@ def user():
 @app.route("/search")
 def search():
     query = request.args.get("q", "").strip()
-    results = []
+    results = None
 
     if query:
-        results = db.query(
-            """
-            SELECT i.id, i.title, u.username, i.image,
-                   COUNT(s.id) AS signatures
-            FROM initiatives i
-            JOIN users u ON i.creator_id = u.id
-            LEFT JOIN signatures s ON s.initiative_id = i.id
-            WHERE i.deleted = 0
-              AND (i.title LIKE ? OR i.description LIKE ? OR u.username LIKE ?)
-            GROUP BY i.id
-            ORDER BY i.created_at DESC
-            """,
-            [f"%{query}%", f"%{query}%", f"%{query}%"]
-        )
+        results = search_initiatives(query, request.args.get("cursor"))
 
     return render_template("search.html", query=query, results=results)
 
@@ -134,7 +314,7 @@ def edit_initiative(id):
     if "user_id" not in session:
         abort(403)
 
-    rows = db.query("SELECT id, title, description, creator_id, active, image, deleted FROM initiatives WHERE id = ?", [id])
+    rows = db.query("SELECT id, title, description, creator_id, active, image_hash, deleted FROM initiatives WHERE id = ?", [id])
     if not rows:
         abort(404)
     initiative = rows[0]
@@ -160,27 +340,56 @@ def edit_initiative(id):
                     return "Image too large (max 100 KB)", 400
                 image = data
 
-        if remove_image:
-            db.execute(
-                "UPDATE initiatives SET title=?, description=?, image=NULL WHERE id=?",
-                [title, description, id]
-            )
-        elif image is not None:
-            db.execute(
-                "UPDATE initiatives SET title=?, description=?, image=? WHERE id=?",
-                [title, description, image, id]
-            )
-        else:
-            db.execute(
-                "UPDATE initiatives SET title=?, description=? WHERE id=?",
-                [title, description, id]
-            )
+        prepared = None
+        if image is not None:
+            try:
+                prepared = images.prepare_image(image)
+            except images.InvalidImage:
+                return "Invalid image", 400
+
+        with db.transaction():
+            if remove_image:
+                # NULL falls back to the shared default image
+                db.execute(
+                    "UPDATE initiatives SET title=?, description=?, image_hash=NULL WHERE id=?",
+                    [title, description, id]
+                )
+            elif prepared is not None:
+                db.execute(
+                    "UPDATE initiatives SET title=?, description=?, image_hash=? WHERE id=?",
+                    [title, description, images.store_image(prepared), id]
+                )
+            else:
+                db.execute(
+                    "UPDATE initiatives SET title=?, description=? WHERE id=?",
+                    [title, description, id]
+                )
 
         return redirect(url_for("user"))
 
     return render_template("edit_initiative.html", initiative=initiative)
 
 
+# --- INITIATIVE DEADLINES ---
+# An initiative is open through its end date (UTC). deadline_sweeper flips
+# expired ones to active = 0 in batches; until its next tick the write paths
+# check the date themselves.
+def initiative_open(initiative):
+    """True if the initiative is active and its end date has not passed."""
+    end_date = initiative["end_date"]
+    today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+    return bool(initiative["active"]) and (end_date is None or end_date >= today)
+
+
+def reopen_initiative(id):
+    """Set an initiative active unless its end date has passed. Returns True if it is active."""
+    db.execute(
+        "UPDATE initiatives SET active = 1 WHERE id = ? AND (end_date IS NULL OR end_date >= date('now'))",
+        [id],
+    )
+    return db.query("SELECT changes() AS c")[0]["c"] == 1
+
+
 # --- ACTIVATE INITIATIVE ---
 @app.route("/initiative/<int:id>/activate", methods=["POST"])
 def activate_initiative(id):
@@ -195,7 +404,8 @@ def activate_initiative(id):
     if initiative["creator_id"] != session["user_id"]:
         abort(403)
 
-    db.execute("UPDATE initiatives SET active = 1 WHERE id = ?", [id])
+    if not reopen_initiative(id):
+        flash("Aloitteen määräaika on päättynyt, sitä ei voi aktivoida.")
     return redirect(url_for("user"))
 
 
@@ -236,8 +446,8 @@ def delete_initiative(id):
 
 
 # --- INITIATIVE SIGNATURES LIST ---
-@app.route("/initiative/<int:id>/signatures")
-def initiative_signatures(id):
+def signatures_initiative(id):
+    """The initiative whose signers may be listed: only its creator or an admin."""
     if "user_id" not in session:
         abort(403)
 
@@ -250,18 +460,25 @@ def initiative_signatures(id):
     initiative = initiative[0]
 
     # Allow only creator or admin
-    if initiative["creator_id"] != session["user_id"] and not session.get("is_admin"):
+    if initiative["creator_id"] != session["user_id"] and not role_cache.is_admin(session["user_id"]):
         abort(403)
+    return initiative
+
 
-    signatures = db.query(
+@app.route("/initiative/<int:id>/signatures")
+def initiative_signatures(id):
+    initiative = signatures_initiative(id)
+
+    signatures = paginate(
         """
-        SELECT u.username, s.signed_at
+        SELECT s.id, u.username, s.signed_at
         FROM signatures s
         JOIN users u ON s.user_id = u.id
         WHERE s.initiative_id = ?
-        ORDER BY s.signed_at DESC
         """,
         [id],
+        ("signed_at", "id"),
+        request.args.get("cursor"),
     )
 
     return render_template("initiative_signatures.html",
@@ -269,6 +486,74 @@ def initiative_signatures(id):
                            signatures=signatures)
 
 
+# --- SIGNATURES EXPORT (CSV / NDJSON) ---
+EXPORT_CHUNK = 64 * 1024  # characters buffered before a chunk is sent
+
+
+def date_arg(name):
+    """Optional YYYY-MM-DD query argument; 400 if malformed."""
+    value = request.args.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
+
+def spreadsheet_safe(value):
+    # A cell starting with = + - @ is run as a formula by spreadsheet programs
+    return "'" + value if value[:1] in ("=", "+", "-", "@") else value
+
+
+@app.route("/initiative/<int:id>/signatures.<any(csv, ndjson):fmt>")
+def export_signatures(id, fmt):
+    initiative = signatures_initiative(id)
+
+    # Inclusive date range; ordered like the (initiative_id, signed_at, user_id)
+    # index, so the rows are read straight from it without sorting
+    sql = """
+        SELECT u.username, s.signed_at
+        FROM signatures s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.initiative_id = ?
+    """
+    params = [initiative["id"]]
+    start, end = date_arg("from"), date_arg("to")
+    if start:
+        sql += " AND s.signed_at >= ?"
+        params.append(start.isoformat())
+    if end:
+        sql += " AND s.signed_at < ?"
+        params.append((end + datetime.timedelta(days=1)).isoformat())
+    sql += " ORDER BY s.signed_at, s.user_id"
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(["username", "signed_at"])
+        for row in db.stream(sql, params):
+            if fmt == "csv":
+                writer.writerow([spreadsheet_safe(row["username"]), row["signed_at"]])
+            else:
+                buffer.write(json.dumps({"username": row["username"], "signed_at": row["signed_at"]},
+                                        ensure_ascii=False))
+                buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=aloite-{initiative['id']}-allekirjoitukset.{fmt}"
+    )
+    return response
+
+
 
 
 # --- REGISTER NEW USER ---
@@ -293,9 +578,9 @@ def register():
             return redirect(url_for("register"))
 
         # Hash password
-        hash_value = generate_password_hash(password1)
+        hash_value = password_hasher.hash(password1)
         try:
-            db.execute(
+            user_id = db.execute(
                 "INSERT INTO users (username, first_name, last_name, password_hash) VALUES (?, ?, ?, ?)",
                 [username, first_name, last_name, hash_value],
             )
@@ -304,9 +589,8 @@ def register():
             return redirect(url_for("register"))
 
         # Auto-login new user
-        row = db.query("SELECT id FROM users WHERE username = ?", [username])[0]
         session["username"] = username
-        session["user_id"] = row["id"]
+        session["user_id"] = user_id
 
         flash(f"Tervetuloa {first_name} {last_name}, rekisteröityminen onnistui!")
         return redirect(url_for("index"))
@@ -319,16 +603,22 @@ def login():
     username = request.form.get("username", "").strip()
     password = request.form.get("password", "")
 
-    rows = db.query("SELECT id, username, password_hash, is_admin FROM users WHERE username = ?", [username])
+    rows = db.query("SELECT id, username, password_hash FROM users WHERE username = ?", [username])
     if not rows:
         flash("Invalid username or password")
         return redirect(url_for("index"))
 
     user = rows[0]
-    if check_password_hash(user["password_hash"], password):
+    if password_hasher.check(user["password_hash"], password):
+        if password_hasher.needs_rehash(user["password_hash"]):
+            # Stored with an older method or cost: upgrade while we have the password
+            db.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                [password_hasher.hash(password), user["id"], user["password_hash"]],
+            )
+            password_hasher.rehashed()
         session["username"] = user["username"]
         session["user_id"] = user["id"]
-        session["is_admin"] = int(user["is_admin"])
         flash(f"Login successful, welcome {user['username']}!")
         return redirect(url_for("index"))
     else:
@@ -341,7 +631,6 @@ def login():
 def logout():
     session.pop("username", None)
     session.pop("user_id", None)
-    session.pop("is_admin", None)
     flash("You have been logged out")
     return redirect(url_for("index"))
 
@@ -363,6 +652,16 @@ def create():
     title = request.form["title"].strip()
     description = request.form["description"].strip()
     active = 1 if request.form.get("active") else 0
+    # Optional end date; the deadline sweeper closes the initiative after it
+    end_date = request.form.get("end_date", "").strip() or None
+    if end_date is not None:
+        try:
+            end_date = datetime.date.fromisoformat(end_date)
+        except ValueError:
+            return "Invalid end date", 400
+        if end_date < datetime.datetime.now(datetime.timezone.utc).date():
+            return "End date is in the past", 400
+        end_date = end_date.isoformat()
 
     image = None
     if "image" in request.files:
@@ -373,34 +672,261 @@ def create():
                 return "Image too large (max 100 KB)", 400
             image = data
 
-    if image is None:
-        default_path = os.path.join(app.root_path, "static", "kukka_optimized_50.png")
-        with open(default_path, "rb") as f:
-            image = f.read()
+    prepared = None
+    if image is not None:
+        try:
+            prepared = images.prepare_image(image)
+        except images.InvalidImage:
+            return "Invalid image", 400
 
-    db.execute(
-        "INSERT INTO initiatives (title, description, creator_id, active, image) VALUES (?, ?, ?, ?, ?)",
-        [title, description, session["user_id"], active, image],
-    )
+    with db.transaction():
+        # Without an upload image_hash stays NULL and the shared default image is used
+        image_hash = images.store_image(prepared) if prepared is not None else None
+        db.execute(
+            "INSERT INTO initiatives (title, description, creator_id, active, image_hash, end_date) VALUES (?, ?, ?, ?, ?, ?)",
+            [title, description, session["user_id"], active, image_hash, end_date],
+        )
     return redirect("/")
 
 
 # --- SERVE INITIATIVE IMAGE ---
 @app.route("/initiative_image/<int:id>")
 def initiative_image(id):
-    rows = db.query("SELECT image FROM initiatives WHERE id=?", [id])
-    if not rows or rows[0]["image"] is None:
-        default_path = os.path.join(app.root_path, "static", "kukka_optimized_50.png")
-        with open(default_path, "rb") as f:
-            image_bytes = f.read()
+    rows = db.query("SELECT image_hash FROM initiatives WHERE id=?", [id])
+    if not rows or rows[0]["image_hash"] is None:
+        return default_image()
+
+    digest = rows[0]["image_hash"]
+    size, fmt = requested_variant()
+    # Answer revalidations from the hash alone, without reading the BLOB
+    etag = images.variant_etag(digest, size, fmt)
+    if request.if_none_match.contains(etag):
+        return image_response(None, None, etag, digest)
+
+    image = images.load_image(digest, size, fmt)
+    if image is None:
+        return default_image()
+    mime, data, etag = image
+    return image_response(data, mime, etag, digest)
+
+
+# --- SERVE DEFAULT IMAGE ---
+@app.route("/default_image")
+def default_image():
+    size, fmt = requested_variant()
+    mime, data, etag = images.default_variant(size, fmt)
+    if request.if_none_match.contains(etag):
+        return image_response(None, None, etag, images.default_image()[1])
+    return image_response(data, mime, etag, images.default_image()[1])
+
+
+def requested_variant():
+    """Size from ?size=thumb|detail (default detail) and the best format the client accepts.
+
+    There is no size for the original: an upload may carry EXIF or GPS
+    metadata, which only the re-encoded variants are free of.
+    """
+    size = request.args.get("size")
+    if size not in images.VARIANTS:
+        size = "detail"
+    fmt = "webp" if request.accept_mimetypes["image/webp"] else "jpeg"
+    return size, fmt
+
+
+def image_response(data, mime, etag, digest):
+    """Image response with a content-hash ETag; `data=None` gives a 304."""
+    if data is None:
+        response = app.response_class(status=304)
     else:
-        image_bytes = rows[0]["image"]
+        response = make_response(data)
+        response.headers.set("Content-Type", mime)
+    response.set_etag(etag)
+    # The format depends on the Accept header
+    response.vary.add("Accept")
+    if request.args.get("v") == images.url_version(digest):
+        # The URL names this exact content, so it can be cached for good
+        response.cache_control.public = True
+        response.cache_control.max_age = images.IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+@app.template_global()
+def image_url(initiative, size=None):
+    """Versioned image URL for an initiative row with an image_hash column."""
+    if initiative["image_hash"] is None:
+        _, digest = images.default_image()
+        return url_for("default_image", size=size, v=images.url_version(digest))
+    return url_for("initiative_image", id=initiative["id"], size=size,
+                   v=images.url_version(initiative["image_hash"]))
+
+
+# --- JSON API (read-only) ---
+# ETags come from version stamps kept by triggers: the global data version
+# for lists, initiatives.version for one initiative. A matching
+# If-None-Match is answered with 304 before any listing query runs.
+API_STATUS = {"all": "", "open": "AND i.active = 1", "closed": "AND i.active = 0"}
+API_COUNTS_PER_PAGE = 500
 
-    response = make_response(image_bytes)
-    response.headers.set("Content-Type", "image/jpeg")
+
+def api_response(payload, etag):
+    """JSON response with an ETag that clients must revalidate; `payload=None` gives a 304."""
+    if payload is None:
+        response = app.response_class(status=304)
+    else:
+        response = app.json.response(payload)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
     return response
 
 
+def api_initiative(row, size="thumb"):
+    initiative = {key: row[key] for key in row.keys() if key != "image_hash"}
+    initiative["active"] = bool(row["active"])
+    initiative["image_url"] = image_url(row, size)
+    return initiative
+
+
+def api_page(page, items):
+    return {"items": items, "next_cursor": page.next_cursor, "prev_cursor": page.prev_cursor}
+
+
+@app.route("/api/initiatives")
+def api_initiatives():
+    status = request.args.get("status", "all")
+    if status not in API_STATUS:
+        return {"error": "status must be one of: " + ", ".join(API_STATUS)}, 400
+
+    etag = f"d{db.data_version()}"
+    if request.if_none_match.contains(etag):
+        return api_response(None, etag)
+
+    page = paginate(
+        f"""
+        SELECT i.id, i.title, u.username, i.image_hash, i.created_at, i.end_date,
+               i.active, i.signature_count AS signatures
+        FROM initiatives i
+        JOIN users u ON i.creator_id = u.id
+        WHERE i.deleted = 0 {API_STATUS[status]}
+        """,
+        [],
+        ("created_at", "id"),
+        request.args.get("cursor"),
+    )
+    return api_response(api_page(page, [api_initiative(row) for row in page.rows]), etag)
+
+
+@app.route("/api/initiatives/<int:id>")
+def api_initiative_detail(id):
+    rows = db.query("SELECT version FROM initiatives WHERE id = ? AND deleted = 0", [id])
+    if not rows:
+        return {"error": "not found"}, 404
+
+    etag = f"i{id}-{rows[0]['version']}"
+    if request.if_none_match.contains(etag):
+        return api_response(None, etag)
+
+    row = db.query(
+        """
+        SELECT i.id, i.title, i.description, u.username, i.image_hash, i.created_at,
+               i.start_date, i.end_date, i.active, i.signature_count AS signatures
+        FROM initiatives i
+        JOIN users u ON i.creator_id = u.id
+        WHERE i.id = ?
+        """,
+        [id],
+    )[0]
+    return api_response(api_initiative(row, "detail"), etag)
+
+
+@app.route("/api/initiatives/counts")
+def api_signature_counts():
+    etag = f"d{db.data_version()}"
+    if request.if_none_match.contains(etag):
+        return api_response(None, etag)
+
+    page = paginate(
+        "SELECT id, signature_count AS signatures FROM initiatives WHERE deleted = 0",
+        [],
+        ("id",),
+        request.args.get("cursor"),
+        per_page=API_COUNTS_PER_PAGE,
+        descending=False,
+    )
+    return api_response(api_page(page, [dict(row) for row in page.rows]), etag)
+
+
+# --- LIVE SIGNATURE COUNTS (SSE) ---
+LIVE_MAX_IDS = 100
+LIVE_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+LIVE_BUSY_RETRY = 30  # seconds a viewer waits when every stream slot is taken
+
+
+def sse_event(counts):
+    data = json.dumps([{"id": i, "signatures": n} for i, n in sorted(counts.items())])
+    return f"event: counts\ndata: {data}\n\n"
+
+
+@app.route("/live/signatures")
+def live_signatures():
+    try:
+        ids = {int(part) for part in request.args.get("ids", "").split(",") if part.strip()}
+    except ValueError:
+        return {"error": "ids must be comma-separated integers"}, 400
+    if not ids or len(ids) > LIVE_MAX_IDS:
+        return {"error": f"give 1-{LIVE_MAX_IDS} initiative ids"}, 400
+
+    # Subscribe before reading, so a change in between is not lost
+    try:
+        subscription = count_notifier.subscribe(ids)
+    except LiveBusy:
+        # Every stream slot of this worker is taken: the page keeps its count
+        # as of the load and initiative.js reconnects after Retry-After
+        return Response(
+            f"retry: {LIVE_BUSY_RETRY * 1000}\n\n", 503,
+            {"Retry-After": str(LIVE_BUSY_RETRY)}, mimetype="text/event-stream",
+        )
+    rows = db.query(
+        f"""
+        SELECT id, signature_count FROM initiatives
+        WHERE deleted = 0 AND id IN ({", ".join("?" * len(ids))})
+        """,
+        sorted(ids),
+    )
+    if not rows:
+        count_notifier.unsubscribe(subscription)
+        return {"error": "not found"}, 404
+    initial = {row["id"]: row["signature_count"] for row in rows}
+
+    # No stream_with_context: the stream must not hold a pooled connection
+    def stream():
+        try:
+            yield sse_event(initial)
+            while True:
+                updates = subscription.wait(LIVE_HEARTBEAT)
+                yield sse_event(updates) if updates else ": keep-alive\n\n"
+        finally:
+            count_notifier.unsubscribe(subscription)
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # nginx: pass events through unbuffered
+    return response
+
+
+# --- CLI: IMAGE VARIANTS ---
+@app.cli.command("rebuild-image-variants")
+def rebuild_image_variants_command():
+    """Render thumbnails and detail images for images stored without them."""
+    if images.Image is None:
+        click.echo("Pillow is not installed; images are served as uploaded")
+        return
+    created, skipped = images.rebuild_variants()
+    click.echo(f"Variants rendered for {created} images ({skipped} undecodable images skipped)")
+
+
 # --- INITIATIVE PAGE + SIGNATURES ---
 @app.route("/initiative/<int:id>", methods=["GET", "POST"])
 def initiative_page(id):
@@ -420,57 +946,256 @@ def initiative_page(id):
     if request.method == "POST":
         if "user_id" not in session:
             abort(403)
-        if initiative["active"] == 0:
+        if not initiative_open(initiative):
             abort(403)
 
         if "sign" in request.form:
-            try:
-                db.execute(
-                    "INSERT INTO signatures(user_id, initiative_id) VALUES (?, ?)",
-                    [session["user_id"], id]
-                )
-            except sqlite3.IntegrityError:
-                pass
+            change_signature(session["user_id"], id, SIGN)
         elif "unsign" in request.form:
+            change_signature(session["user_id"], id, UNSIGN)
+        return redirect(url_for("initiative_page", id=id))
+
+    signatures = initiative["signature_count"]
+
+    return render_template(
+        "initiative.html", initiative=initiative, signatures=signatures, user_signature=user_signature,
+        is_open=initiative_open(initiative),
+    )
+
+
+def change_signature(user_id, initiative_id, op, notify=True):
+    """Single write path for signing (SIGN) and unsigning (UNSIGN).
+
+    Returns True if the signature state changed. With SIGNATURE_BATCHING
+    the change goes through the group-commit writer and this returns once
+    its batch has been committed. Callers inside a transaction pass
+    notify=False and publish to live viewers after it commits.
+    """
+    if app.config["SIGNATURE_BATCHING"]:
+        try:
+            changed = signature_writer.submit(op, user_id, initiative_id)
+        except sqlite3.IntegrityError:
+            changed = False
+    elif op == SIGN:
+        try:
             db.execute(
-                "DELETE FROM signatures WHERE user_id=? AND initiative_id=?",
-                [session["user_id"], id]
+                "INSERT INTO signatures(user_id, initiative_id) VALUES (?, ?)",
+                [user_id, initiative_id]
             )
-        return redirect(url_for("initiative_page", id=id))
+            changed = True
+        except sqlite3.IntegrityError:
+            changed = False
+    else:
+        db.execute(
+            "DELETE FROM signatures WHERE user_id=? AND initiative_id=?",
+            [user_id, initiative_id]
+        )
+        changed = db.query("SELECT changes() AS c")[0]["c"] == 1
+
+    if changed and notify:
+        # Live viewers get the new count on the notifier's next tick
+        count_notifier.publish(initiative_id)
+    return changed
 
-    signatures = db.query("SELECT COUNT(*) AS c FROM signatures WHERE initiative_id=?", [id])[0]["c"]
 
-    return render_template("initiative.html", initiative=initiative, signatures=signatures, user_signature=user_signature)
+# --- JSON SIGN / UNSIGN ---
+# PUT signs, DELETE removes the signature. Both are idempotent and answer
+# with the new state in one round trip, so static/initiative.js needs no
+# redirect and reload. Cross-site pages cannot send these methods with the
+# session cookie without a CORS preflight, which this app never allows.
+@app.route("/api/initiatives/<int:id>/signature", methods=["PUT", "DELETE"])
+def api_signature(id):
+    if "user_id" not in session:
+        return {"error": "login required"}, 401
+    op = SIGN if request.method == "PUT" else UNSIGN
+
+    # The state check, the write and the count read share one transaction.
+    # The group-commit writer writes on its own connection, so with
+    # SIGNATURE_BATCHING they are separate statements instead.
+    with nullcontext() if app.config["SIGNATURE_BATCHING"] else db.transaction():
+        rows = db.query("SELECT active, end_date FROM initiatives WHERE id = ? AND deleted = 0", [id])
+        if not rows:
+            return {"error": "not found"}, 404
+        if not initiative_open(rows[0]):
+            return {"error": "initiative is closed"}, 409
+        changed = change_signature(session["user_id"], id, op, notify=False)
+        count = db.query("SELECT signature_count FROM initiatives WHERE id = ?", [id])[0][0]
+    if changed:
+        # Only now is the change visible to the notifier's connection
+        count_notifier.publish(id)
+    return {"id": id, "signed": op == SIGN, "changed": changed, "signatures": count}
 
 
 # --- ADMIN DECORATOR ---
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if "user_id" not in session:
-            abort(403)
-        user = db.query("SELECT is_admin FROM users WHERE id = ?", [session["user_id"]])
-        if not user or user[0]["is_admin"] != 1:
+        if "user_id" not in session or not role_cache.is_admin(session["user_id"]):
             abort(403)
         return f(*args, **kwargs)
     return decorated_function
 
 
+@app.template_global()
+def current_user_is_admin():
+    # The session flag set at login goes stale when roles change; ask the cache
+    return "user_id" in session and role_cache.is_admin(session["user_id"])
+
+
 # --- ADMIN DASHBOARD ---
+# Server-side filtered and sorted, keyset-paginated lists that select only
+# the columns they show. The creator's name is a scalar subquery rather than
+# a join, so sorting by signature count sorts initiatives alone and looks up
+# names for one page only.
+ADMIN_DELETED = {"all": "", "no": "AND i.deleted = 0", "yes": "AND i.deleted = 1"}
+ADMIN_SORTS = {  # name: (keyset columns, descending)
+    "newest": (("created_at", "id"), True),
+    "oldest": (("created_at", "id"), False),
+    "signatures": (("signatures", "id"), True),
+}
+ADMIN_ROLES = {"all": "", "admin": "AND is_admin = 1"}
+ADMIN_USER_SORTS = {
+    "oldest": (("id",), False),
+    "newest": (("id",), True),
+    "username": (("username",), False),
+}
+
+
+def admin_choice(name, choices):
+    """Query argument that must be one of `choices` (default: the first); 400 otherwise."""
+    value = request.args.get(name) or next(iter(choices))
+    if value not in choices:
+        abort(400)
+    return value
+
+
+def admin_redirect(endpoint):
+    """Back to the admin list an action was posted from, keeping its filters and page."""
+    return redirect(request.referrer or url_for(endpoint))
+
+
+def admin_counts():
+    """Dashboard totals from the counters triggers keep in `meta`, without scanning any table."""
+    counts = db.totals()
+    counts["initiatives"] = counts["open"] + counts["closed"] + counts["deleted"]
+    return counts
+
+
+def initiative_filter():
+    """SQL conditions (on `initiatives i`) and parameters for the filters in the query string."""
+    status = admin_choice("status", API_STATUS)
+    deleted = admin_choice("deleted", ADMIN_DELETED)
+    where = f"{API_STATUS[status]} {ADMIN_DELETED[deleted]}".strip()
+    params = []
+    creator = request.args.get("creator", "").strip()
+    if creator:
+        where += " AND i.creator_id = (SELECT id FROM users WHERE username = ?)"
+        params.append(creator)
+    min_signatures = request.args.get("min_signatures", "").strip()
+    if min_signatures:
+        if not min_signatures.isdigit():
+            abort(400)
+        where += " AND i.signature_count >= ?"
+        params.append(int(min_signatures))
+    start, end = date_arg("from"), date_arg("to")
+    if start:
+        where += " AND i.created_at >= ?"
+        params.append(start.isoformat())
+    if end:
+        where += " AND i.created_at < ?"
+        params.append((end + datetime.timedelta(days=1)).isoformat())
+    return where, params
+
+
+def user_filter():
+    """SQL conditions (on `users`) and parameters for the filters in the query string."""
+    role = admin_choice("role", ADMIN_ROLES)
+    where = ADMIN_ROLES[role]
+    params = []
+    prefix = request.args.get("q", "").strip()
+    if prefix:
+        # Prefix match as a range on the unique username index
+        where += " AND username >= ? AND username < ?"
+        params += [prefix, prefix + "\U0010ffff"]
+    return where, params
+
+
 @app.route("/admin")
 @admin_required
 def admin_dashboard():
-    users = db.query("SELECT id, username, created_at, is_admin FROM users ORDER BY id")
-    initiatives = db.query("""
-        SELECT i.id, i.title, i.description, i.active, i.deleted, i.image, u.username,
-               COUNT(s.id) AS signatures
+    keys, descending = ADMIN_SORTS[admin_choice("sort", ADMIN_SORTS)]
+    where, params = initiative_filter()
+    initiatives = paginate(
+        f"""
+        SELECT i.id, i.title, i.active, i.deleted, i.image_hash, i.created_at, i.end_date,
+               i.signature_count AS signatures,
+               (SELECT username FROM users WHERE id = i.creator_id) AS username
         FROM initiatives i
-        JOIN users u ON i.creator_id = u.id
-        LEFT JOIN signatures s ON s.initiative_id = i.id
-        GROUP BY i.id
-        ORDER BY i.id DESC
-    """)
-    return render_template("admin.html", users=users, initiatives=initiatives)
+        WHERE 1 = 1 {where}
+        """,
+        params,
+        keys,
+        request.args.get("cursor"),
+        descending=descending,
+    )
+    return render_template("admin.html", initiatives=initiatives, counts=admin_counts())
+
+
+@app.route("/admin/users")
+@admin_required
+def admin_users():
+    keys, descending = ADMIN_USER_SORTS[admin_choice("sort", ADMIN_USER_SORTS)]
+    where, params = user_filter()
+    users = paginate(
+        f"SELECT id, username, created_at, is_admin FROM users WHERE 1 = 1 {where}",
+        params,
+        keys,
+        request.args.get("cursor"),
+        descending=descending,
+    )
+    return render_template("admin_users.html", users=users)
+
+
+# --- SIGNATURE SUMMARY ---
+def render_summary(fmt, initiative=None):
+    """Summary page or JSON from the hourly rollups (see summary.py)."""
+    days = min(max(request.args.get("days", 30, type=int), 1), 365)
+    bucket = request.args.get("bucket")
+    if bucket not in ("hour", "day"):
+        bucket = "hour" if days <= 2 else "day"
+    result = summarize(days, initiative["id"] if initiative else None, bucket)
+    if fmt == "json":
+        return result
+    peak = max((point["signatures"] for point in result["series"]), default=0)
+    return render_template("summary.html", summary=result, initiative=initiative, peak=peak)
+
+
+@app.route("/admin/summary", defaults={"fmt": "html"})
+@app.route("/admin/summary.<any(json):fmt>")
+@admin_required
+def admin_summary(fmt):
+    return render_summary(fmt)
+
+
+@app.route("/initiative/<int:id>/summary", defaults={"fmt": "html"})
+@app.route("/initiative/<int:id>/summary.<any(json):fmt>")
+def initiative_summary(id, fmt):
+    return render_summary(fmt, signatures_initiative(id))
+
+
+# --- ADMIN: RUNTIME STATISTICS ---
+@app.route("/admin/stats")
+@admin_required
+def admin_stats():
+    return {
+        "db_pool": db.pool_stats(),
+        "signature_writer": signature_writer.stats(),
+        "fragment_cache": fragment_cache.stats(),
+        "role_cache": role_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "live_counts": count_notifier.stats(),
+        "deadline_sweeper": deadline_sweeper.stats(),
+    }
 
 
 # --- ADMIN: RESTORE INITIATIVE ---
@@ -479,17 +1204,18 @@ def admin_dashboard():
 def admin_restore_initiative(id):
     db.execute("UPDATE initiatives SET deleted = 0 WHERE id = ?", [id])
     flash("Initiative restored")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_dashboard")
 
 
 # --- ADMIN: PURGE INITIATIVE ---
 @app.route("/admin/initiative/<int:id>/purge", methods=["POST"])
 @admin_required
 def admin_purge_initiative(id):
-    db.execute("DELETE FROM signatures WHERE initiative_id = ?", [id])
-    db.execute("DELETE FROM initiatives WHERE id = ?", [id])
+    with db.transaction():
+        db.execute("DELETE FROM signatures WHERE initiative_id = ?", [id])
+        db.execute("DELETE FROM initiatives WHERE id = ?", [id])
     flash("Initiative permanently deleted")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_dashboard")
 
 
 # --- ADMIN: DELETE USER ---
@@ -498,14 +1224,16 @@ def admin_purge_initiative(id):
 def admin_delete_user(id):
     if id == session.get("user_id"):
         flash("You cannot delete yourself!")
-        return redirect(url_for("admin_dashboard"))
+        return admin_redirect("admin_users")
 
-    db.execute("DELETE FROM signatures WHERE user_id = ?", [id])
-    db.execute("DELETE FROM initiatives WHERE creator_id = ?", [id])
-    db.execute("DELETE FROM users WHERE id = ?", [id])
+    with db.transaction():
+        db.execute("DELETE FROM signatures WHERE user_id = ?", [id])
+        db.execute("DELETE FROM initiatives WHERE creator_id = ?", [id])
+        db.execute("DELETE FROM users WHERE id = ?", [id])
+    role_cache.invalidate(id)
 
     flash("User permanently deleted")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_users")
 
 
 # --- ADMIN: GRANT ADMIN RIGHTS ---
@@ -514,11 +1242,12 @@ def admin_delete_user(id):
 def admin_make_admin(id):
     if id == session.get("user_id"):
         flash("You already have admin rights")
-        return redirect(url_for("admin_dashboard"))
+        return admin_redirect("admin_users")
 
     db.execute("UPDATE users SET is_admin = 1 WHERE id = ?", [id])
+    role_cache.invalidate(id)
     flash("User granted admin rights")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_users")
 
 
 # --- ADMIN: REMOVE ADMIN RIGHTS ---
@@ -527,11 +1256,12 @@ def admin_make_admin(id):
 def admin_remove_admin(id):
     if id == session.get("user_id"):
         flash("You cannot remove your own admin rights!")
-        return redirect(url_for("admin_dashboard"))
+        return admin_redirect("admin_users")
 
     db.execute("UPDATE users SET is_admin = 0 WHERE id = ?", [id])
+    role_cache.invalidate(id)
     flash("User admin rights removed")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_users")
 
 
 # --- ADMIN: EDIT INITIATIVE ---
@@ -564,9 +1294,11 @@ def admin_edit_initiative(id):
 @app.route("/admin/initiative/<int:id>/activate", methods=["POST"])
 @admin_required
 def admin_activate_initiative(id):
-    db.execute("UPDATE initiatives SET active = 1 WHERE id = ?", [id])
-    flash("Initiative activated", "success")
-    return redirect(url_for("admin_dashboard"))
+    if reopen_initiative(id):
+        flash("Initiative activated", "success")
+    else:
+        flash("Initiative has passed its end date and cannot be activated", "error")
+    return admin_redirect("admin_dashboard")
 
 
 # --- ADMIN: DEACTIVATE INITIATIVE ---
@@ -575,7 +1307,7 @@ def admin_activate_initiative(id):
 def admin_deactivate_initiative(id):
     db.execute("UPDATE initiatives SET active = 0 WHERE id = ?", [id])
     flash("Initiative deactivated", "success")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_dashboard")
 
 
 # --- ADMIN: SOFT DELETE INITIATIVE ---
@@ -584,7 +1316,183 @@ def admin_deactivate_initiative(id):
 def admin_delete_initiative(id):
     db.execute("UPDATE initiatives SET deleted = 1 WHERE id = ?", [id])
     flash("Initiative marked as deleted", "success")
-    return redirect(url_for("admin_dashboard"))
+    return admin_redirect("admin_dashboard")
+
+
+# --- ADMIN: BULK ACTIONS ---
+# One POST applies an action to the checked rows (scope=selected) or to
+# every row matching the list's filters (scope=filter, the filters travel
+# in the query string). The target ids are resolved once, then every
+# statement works on the whole set through one JSON array parameter, in
+# one transaction. The triggers keep signature counts, rollups, the search
+# index and the cache versions consistent, as they do for single actions.
+# A filter scope needs a filter that narrows the rows by itself, and is
+# applied only after the admin confirms the number of rows it resolves to.
+SELECTED = "SELECT value FROM json_each(?)"
+
+BULK_INITIATIVE_ACTIONS = {  # action: (statements, message)
+    "activate": (
+        [f"""UPDATE initiatives SET active = 1 WHERE id IN ({SELECTED}) AND active = 0
+             AND (end_date IS NULL OR end_date >= date('now'))"""],
+        "{} initiatives activated",
+    ),
+    "deactivate": (
+        [f"UPDATE initiatives SET active = 0 WHERE id IN ({SELECTED}) AND active = 1"],
+        "{} initiatives deactivated",
+    ),
+    "delete": (
+        [f"UPDATE initiatives SET deleted = 1 WHERE id IN ({SELECTED}) AND deleted = 0"],
+        "{} initiatives marked as deleted",
+    ),
+    "restore": (
+        [f"UPDATE initiatives SET deleted = 0 WHERE id IN ({SELECTED}) AND deleted = 1"],
+        "{} initiatives restored",
+    ),
+    "purge": (
+        [f"DELETE FROM signatures WHERE initiative_id IN ({SELECTED})",
+         f"DELETE FROM initiatives WHERE id IN ({SELECTED})"],
+        "{} initiatives permanently deleted",
+    ),
+}
+
+BULK_USER_ACTIONS = {
+    "make_admin": (
+        [f"UPDATE users SET is_admin = 1 WHERE id IN ({SELECTED}) AND is_admin = 0"],
+        "{} users granted admin rights",
+    ),
+    "remove_admin": (
+        [f"UPDATE users SET is_admin = 0 WHERE id IN ({SELECTED}) AND is_admin = 1"],
+        "{} users' admin rights removed",
+    ),
+    "delete": (
+        [f"DELETE FROM signatures WHERE user_id IN ({SELECTED})",
+         f"DELETE FROM initiatives WHERE creator_id IN ({SELECTED})",
+         f"DELETE FROM users WHERE id IN ({SELECTED})"],
+        "{} users permanently deleted",
+    ),
+}
+
+
+def bulk_confirmation(actions, select_filtered, kind, exclude=None):
+    """Confirmation page for a filter-scope action that has not been confirmed yet, else None.
+
+    The page shows how many rows the filters resolve to now and posts that
+    count back as `confirm`; bulk_apply() refuses if it no longer matches.
+    """
+    if request.form.get("scope") != "filter" or "confirm" in request.form:
+        return None
+    if request.form.get("action") not in actions or select_filtered is None:
+        return None  # bulk_apply() rejects these
+    sql, params = select_filtered
+    count = db.query(
+        f"SELECT COUNT(*) FROM ({sql}) WHERE id IS NOT ?", params + [exclude]
+    )[0][0]
+    return render_template(
+        "admin_bulk_confirm.html", kind=kind, action=request.form["action"], count=count,
+    )
+
+
+def bulk_apply(actions, select_filtered, exclude=None):
+    """Run the posted bulk action in one transaction and flash the affected-row count.
+
+    `select_filtered` is the SELECT of ids matching the current filters as
+    (sql, params), or None unless a selective filter is set: a filter
+    scope never means "every row". Returns the targeted ids (without
+    `exclude`), or None if nothing was run.
+    """
+    action = request.form.get("action")
+    scope = request.form.get("scope")
+    if action not in actions or scope not in ("selected", "filter"):
+        abort(400)
+    if scope == "filter" and select_filtered is None:
+        flash("Set a filter that narrows the rows first: bulk actions never apply to all rows", "error")
+        return None
+    statements, message = actions[action]
+
+    with db.transaction():
+        if scope == "selected":
+            ids = request.form.getlist("ids", type=int)
+        else:
+            ids = [row[0] for row in db.query(*select_filtered)]
+        ids = [id for id in ids if id != exclude]
+        if scope == "filter" and len(ids) != request.form.get("confirm", type=int):
+            flash(f"The filters now match {len(ids)} rows, not the confirmed number; nothing was changed", "error")
+            return None
+        selected = json.dumps(ids)
+        for sql in statements:
+            db.execute(sql, [selected])
+        # Affected rows of the last statement (the rows the action is about)
+        affected = db.query("SELECT changes() AS c")[0]["c"]
+    flash(message.format(affected), "success")
+    return ids
+
+
+@app.route("/admin/initiatives/bulk", methods=["POST"])
+@admin_required
+def admin_bulk_initiatives():
+    where, params = initiative_filter()
+    # min_signatures and deleted=no only narrow a filter that is selective already
+    selective = (
+        admin_choice("status", API_STATUS) != "all"
+        or admin_choice("deleted", ADMIN_DELETED) == "yes"
+        or any(request.args.get(name, "").strip() for name in ("creator", "from", "to"))
+    )
+    select_filtered = (f"SELECT i.id FROM initiatives i WHERE 1 = 1 {where}", params) if selective else None
+    confirmation = bulk_confirmation(BULK_INITIATIVE_ACTIONS, select_filtered, "initiatives")
+    if confirmation:
+        return confirmation
+    bulk_apply(BULK_INITIATIVE_ACTIONS, select_filtered)
+    # The list's filters and page travel in the query string of the form action
+    return redirect(url_for("admin_dashboard", **request.args))
+
+
+@app.route("/admin/users/bulk", methods=["POST"])
+@admin_required
+def admin_bulk_users():
+    where, params = user_filter()
+    selective = admin_choice("role", ADMIN_ROLES) != "all" or request.args.get("q", "").strip()
+    select_filtered = (f"SELECT id FROM users WHERE 1 = 1 {where}", params) if selective else None
+    # Never the acting admin: single actions refuse that too
+    confirmation = bulk_confirmation(BULK_USER_ACTIONS, select_filtered, "users", exclude=session["user_id"])
+    if confirmation:
+        return confirmation
+    ids = bulk_apply(BULK_USER_ACTIONS, select_filtered, exclude=session["user_id"])
+    for id in ids or []:
+        role_cache.invalidate(id)
+    return redirect(url_for("admin_users", **request.args))
+
+
+# --- CLI: SIGNATURE COUNTERS ---
+@app.cli.command("rebuild-counts")
+@click.option("--check", is_flag=True, help="Only report drifted counters, do not fix them.")
+def rebuild_counts_command(check):
+    """Verify or rebuild initiatives.signature_count."""
+    if check:
+        drifted = db.signature_count_drift()
+        for row in drifted:
+            click.echo(f"Initiative {row['id']}: stored {row['stored']}, actual {row['actual']}")
+        click.echo(f"{len(drifted)} initiatives with drifted signature counts")
+        if drifted:
+            raise SystemExit(1)
+    else:
+        fixed = db.rebuild_signature_counts()
+        click.echo(f"Signature counts rebuilt ({fixed} initiatives corrected)")
+
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Backfill the hourly signature rollups from the signatures table."""
+    rows = db.rebuild_signature_rollups()
+    click.echo(f"Signature rollups rebuilt ({rows} initiative-hours)")
+
+
+# --- CLI: DEADLINES ---
+@app.cli.command("close-expired")
+def close_expired_command():
+    """Close every open initiative whose end date has passed."""
+    with db.transaction() as con:
+        closed = db.close_expired_initiatives(con)
+    click.echo(f"{closed} expired initiatives closed")
 
 
 @app.teardown_appcontext
@@ -0,0 +1,97 @@
+"""Login throughput against the size of the password hashing pool (hashing.py).
+
+Usage: python benchmarks/hashing_benchmark.py [--workers 0 1 2 4] [--threads 32]
+                                              [--logins 256] [--method scrypt:32768:8:1]
+
+Every thread plays a request handler checking one password, as login() does.
+workers=0 checks inline in the request thread, like the app did before the
+pool. Alongside, a probe thread runs a trivial task every millisecond; its
+delay shows how much the hashing starves the other request threads of the
+interpreter.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import PasswordHasher, hash_password  # noqa: E402
+
+
+def run(hasher, password_hash, threads, per_thread):
+    latencies = [[] for _ in range(threads)]
+    probe_delays = []
+    errors = []
+    done = threading.Event()
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(n):
+        try:
+            start_barrier.wait()
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                if not hasher.check(password_hash, "salasana"):
+                    raise AssertionError("password check failed")
+                latencies[n].append(time.perf_counter() - started)
+        except Exception as e:  # report, don't hang the barrier
+            errors.append(e)
+
+    def probe():
+        while not done.is_set():
+            expected = time.perf_counter() + 0.001
+            time.sleep(0.001)
+            probe_delays.append(max(0.0, time.perf_counter() - expected))
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    prober = threading.Thread(target=probe)
+    start_barrier.wait()
+    prober.start()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    flat = sorted(x for per in latencies for x in per)
+    return elapsed, flat, sorted(probe_delays), errors
+
+
+def report(workers, total, elapsed, latencies, probe_delays, errors):
+    p = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    probe = statistics.quantiles(probe_delays, n=100) if len(probe_delays) > 1 else [0] * 99
+    print(
+        f"workers {workers:>3} {total / elapsed:>8.1f} logins/s   p50 {p[49] * 1000:8.1f} ms   "
+        f"p99 {p[98] * 1000:8.1f} ms   probe p99 {probe[98] * 1000:6.2f} ms   errors {len(errors)}"
+    )
+
+
+def main():
+    cores = os.cpu_count()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({0, 1, max(1, cores // 2), cores}))
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=256)
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    args = parser.parse_args()
+
+    per_thread = max(1, args.logins // args.threads)
+    total = per_thread * args.threads
+    password_hash = hash_password("salasana", args.method)
+    print(f"{total} logins, {args.threads} threads, {args.method}, {cores} cores")
+
+    for workers in args.workers:
+        hasher = PasswordHasher(args.method, workers=workers, max_pending=total, timeout=600)
+        if workers:
+            hasher.check(password_hash, "salasana")  # start the pool outside the timing
+        report(workers, total, *run(hasher, password_hash, args.threads, per_thread))
+        hasher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Latency, SQL statements and memory per route against seeded databases.
+
+Usage: python benchmarks/routes_benchmark.py [--scales small medium large]
+                                             [--requests 200] [--output routes.json]
+                                             [--baseline benchmarks/routes_baseline.json]
+                                             [--save-baseline] [--tolerance 0.25]
+                                             [--min-delta 0.5]
+
+Every scale is seeded with init.db.py into a throwaway database. The routes
+are then driven through the Flask test client, anonymously and logged in as
+admin. The hottest open initiative (most signatures) is the target of the
+per-initiative routes. For each route we record:
+
+  p50/p95/p99   latency in ms over --requests requests (after a warm-up)
+  statements    SQL statements per request, as seen by the sqlite3 trace callback
+  peak_kib      peak Python memory of one request, from a separate tracemalloc pass
+
+With --baseline, results are compared against the stored file. A route
+whose p95 grew by more than --tolerance (and by at least --min-delta ms,
+which keeps sub-millisecond noise out), or that runs more statements than
+before, is reported as a regression and the exit status is 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+
+# init.db.py arguments per scale
+SCALES = {
+    "small": ["--users", "250", "--initiatives", "150"],
+    "medium": ["--users", "10000", "--initiatives", "2000",
+               "--distribution", "zipf", "--signatures", "200000"],
+    "large": ["--users", "100000", "--initiatives", "20000",
+              "--distribution", "zipf", "--signatures", "2000000"],
+}
+
+# Statements executed on any connection the app opens, counted per request
+_statements = [0]
+
+
+def traced_connect(connect):
+    def wrapper(*args, **kwargs):
+        con = connect(*args, **kwargs)
+        con.set_trace_callback(count_statement)
+        return con
+    return wrapper
+
+
+def count_statement(sql):
+    # Statements run by triggers are reported as "-- TRIGGER name" comments
+    if not sql.startswith("--"):
+        _statements[0] += 1
+
+
+def routes(target):
+    """(name, logged_in, request function) for every benchmarked route."""
+    state = {"signed": False}
+
+    def sign(client):
+        # Alternate so the table does not grow and both paths are measured
+        state["signed"] = not state["signed"]
+        field = "sign" if state["signed"] else "unsign"
+        return client.post(f"/initiative/{target}", data={field: "1"})
+
+    anonymous = [
+        ("GET /", lambda c: c.get("/")),
+        ("GET /search", lambda c: c.get("/search?q=lorem")),
+        ("GET /initiative/<id>", lambda c: c.get(f"/initiative/{target}")),
+        ("GET /initiative_image/<id>", lambda c: c.get(f"/initiative_image/{target}")),
+    ]
+    logged_in = [
+        ("GET /", lambda c: c.get("/")),
+        ("GET /initiative/<id>", lambda c: c.get(f"/initiative/{target}")),
+        ("POST /initiative/<id> sign/unsign", sign),
+        ("GET /admin", lambda c: c.get("/admin")),
+        ("GET /initiative/<id>/signatures", lambda c: c.get(f"/initiative/{target}/signatures")),
+    ]
+    return [(name, False, fn) for name, fn in anonymous] + [
+        (name, True, fn) for name, fn in logged_in
+    ]
+
+
+def measure(client, fn, requests, warmup):
+    for _ in range(warmup):
+        fn(client)
+
+    latencies = []
+    statements = []
+    errors = 0
+    for _ in range(requests):
+        _statements[0] = 0
+        started = time.perf_counter()
+        response = fn(client)
+        latencies.append(time.perf_counter() - started)
+        statements.append(_statements[0])
+        if response.status_code >= 400:
+            errors += 1
+
+    # Memory in a separate pass: tracemalloc slows everything down
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(requests, 5)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(client)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    p = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "p50_ms": round(p[49] * 1000, 3),
+        "p95_ms": round(p[94] * 1000, 3),
+        "p99_ms": round(p[98] * 1000, 3),
+        "statements": round(statistics.mean(statements), 2),
+        "peak_kib": round(max(peaks) / 1024, 1),
+        "errors": errors,
+    }
+
+
+def run_scale(app_module, path, requests, warmup):
+    # Point the app at this database; fresh caches and connections
+    app_module.create_app({"DATABASE": path})
+
+    con = sqlite3.connect(path)
+    target = con.execute(
+        "SELECT id FROM initiatives WHERE active = 1 AND deleted = 0 ORDER BY signature_count DESC LIMIT 1"
+    ).fetchone()[0]
+    con.close()
+
+    anonymous = app_module.app.test_client()
+    admin = app_module.app.test_client()
+    response = admin.post("/login", data={"username": "admin", "password": "admin123"})
+    if response.status_code != 302 or "user_id" not in session_of(admin):
+        raise SystemExit("login as admin failed")
+
+    results = {}
+    for name, logged_in, fn in routes(target):
+        key = f"{name} ({'admin' if logged_in else 'anonymous'})"
+        results[key] = measure(admin if logged_in else anonymous, fn, requests, warmup)
+        r = results[key]
+        print(
+            f"  {key:<48} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+            f"  {r['statements']:6.1f} stmts  {r['peak_kib']:8.1f} KiB"
+            + (f"  {r['errors']} errors" if r["errors"] else "")
+        )
+    return results
+
+
+def session_of(client):
+    with client.session_transaction() as session:
+        return dict(session)
+
+
+def compare(results, baseline, tolerance, min_delta):
+    regressions = []
+    for scale, routes_ in results.items():
+        for route, now in routes_.items():
+            before = baseline.get("results", {}).get(scale, {}).get(route)
+            if before is None:
+                continue
+            grown = now["p95_ms"] - before["p95_ms"]
+            if grown > before["p95_ms"] * tolerance and grown > min_delta:
+                regressions.append(f"{scale} {route}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+            if now["statements"] > before["statements"]:
+                regressions.append(
+                    f"{scale} {route}: statements {before['statements']} -> {now['statements']}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="routes.json")
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "routes_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative p95 growth before a regression is reported")
+    parser.add_argument("--min-delta", type=float, default=0.5,
+                        help="ignore p95 growth below this many milliseconds")
+    args = parser.parse_args()
+
+    # Inline hashing: a process pool would only add noise to the login
+    os.environ.setdefault("FLASK_PASSWORD_HASH_WORKERS", "0")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for scale in args.scales:
+            paths[scale] = os.path.join(tmp, f"{scale}.db")
+            print(f"seeding {scale} ...", flush=True)
+            subprocess.run(
+                [sys.executable, os.path.join(ROOT, "init.db.py"), "--db", paths[scale],
+                 "--seed", str(args.seed), *SCALES[scale]],
+                check=True, stdout=subprocess.DEVNULL,
+            )
+
+        # The app migrates its database at import: make that a seeded one
+        os.environ["FLASK_DATABASE"] = paths[args.scales[0]]
+        db.connect = traced_connect(db.connect)
+        import app as app_module
+
+        results = {}
+        for scale in args.scales:
+            print(scale)
+            results[scale] = run_scale(app_module, paths[scale], args.requests, args.warmup)
+        db.reset_pool()
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+        if regressions:
+            print("REGRESSIONS against", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
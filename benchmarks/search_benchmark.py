@@ -0,0 +1,114 @@
+"""Compare /search latency of the FTS5 index and the LIKE fallback.
+
+Usage: python benchmarks/search_benchmark.py [--sizes 10000 100000 1000000]
+
+Builds a throwaway database per size with the production schema
+(db.migrate) and times the first result page exactly as search.py
+queries it.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import search  # noqa: E402
+from pagination import page_query  # noqa: E402
+
+COMMON = (
+    "aloite kansalainen kunta valtuusto puisto pyörätie kirjasto koulu päiväkoti "
+    "uimahalli liikenne nopeusrajoitus katuvalo metsä ranta leikkipuisto bussi "
+    "raitiovaunu kierrätys jäte energia aurinkopaneeli lähiruoka kulttuuri "
+    "museo teatteri nuoriso vanhus terveys kävely talvikunnossapito äänestys"
+).split()
+SYLLABLES = "ka ko ku la le li lu ma mi mu na ne no pa pe pi ra re ri sa se si ta te ti va vä ää ö".split()
+
+QUERIES = ["pyörätie", "kirjas", "koulu päiväkoti", "äänes", "user7", "museo ranta"]
+
+
+def vocabulary(rng, size=20000):
+    words = set(COMMON)
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+def sentence(rng, words, weights, length):
+    # Zipf-like word frequencies: a few very common words, a long tail of rare ones
+    return " ".join(rng.choices(words, cum_weights=weights, k=length)).capitalize()
+
+
+def build(path, size, rng, chunk=10000):
+    words = vocabulary(rng)
+    rng.shuffle(words)
+    weights, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1.0 / rank
+        weights.append(total)
+
+    db.migrate(path)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA synchronous = OFF")
+    con.executemany(
+        "INSERT INTO users (username, password_hash) VALUES (?, 'x')",
+        ((f"user{n}",) for n in range(1, 1001)),
+    )
+    for start in range(0, size, chunk):
+        rows = [
+            (
+                sentence(rng, words, weights, 4),
+                sentence(rng, words, weights, rng.randint(10, 60)),
+                rng.randint(1, 1000),
+            )
+            for _ in range(min(chunk, size - start))
+        ]
+        con.executemany(
+            "INSERT INTO initiatives (title, description, creator_id) VALUES (?, ?, ?)", rows
+        )
+        con.commit()
+    con.close()
+
+
+def timed(con, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        con.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'initiatives':>11}  {'query':<16} {'matches':>8} {'fts5 ms':>9} {'like ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            build(path, size, random.Random(args.seed))
+            con = sqlite3.connect(path)
+            for text in QUERIES:
+                pattern = f"%{text}%"
+                expression = search.match_expression(text)
+                matches = len(con.execute(search.SEARCH_FTS_SQL, [expression]).fetchall())
+                # First result page, exactly as search_initiatives() runs it
+                fts_sql, fts_params = page_query(search.SEARCH_FTS_SQL, search.SEARCH_FTS_KEYS, smaller=False)
+                like_sql, like_params = page_query(search.SEARCH_LIKE_SQL, search.SEARCH_LIKE_KEYS)
+                fts = timed(con, fts_sql, [expression] + fts_params, args.repeat)
+                like = timed(con, like_sql, [pattern] * 3 + like_params, args.repeat)
+                print(f"{size:>11}  {text:<16} {matches:>8} {fts:>9.2f} {like:>9.2f} {like / fts:>7.1f}x")
+            con.close()
+
+
+if __name__ == "__main__":
+    main()
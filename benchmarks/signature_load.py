@@ -0,0 +1,118 @@
+"""Signatures per second with and without group commit (signature_writer.py).
+
+Usage: python benchmarks/signature_load.py [--threads 64] [--signatures 20000]
+                                           [--synchronous NORMAL|FULL]
+
+Every thread plays a request handler signing one hot initiative with its own
+users. "direct" commits each signature in its own transaction, as
+change_signature() does without SIGNATURE_BATCHING; "batched" submits the
+same signatures to a SignatureWriter and waits for the commit acknowledgement.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from signature_writer import SignatureWriter, SIGN  # noqa: E402
+
+
+def seed(path, users):
+    db.migrate(path)
+    con = db.connect(path)
+    con.execute("BEGIN")
+    con.executemany(
+        "INSERT INTO users (username, password_hash) VALUES (?, 'x')",
+        ((f"user{n}",) for n in range(1, users + 1)),
+    )
+    con.execute("INSERT INTO initiatives (title, description, creator_id) VALUES ('Hot', 'x', 1)")
+    con.execute("COMMIT")
+    con.close()
+
+
+def run(threads, per_thread, sign):
+    latencies = [[] for _ in range(threads)]
+    errors = []
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(n):
+        try:
+            work = sign(n)
+            start_barrier.wait()
+            for k in range(per_thread):
+                user_id = n * per_thread + k + 1
+                started = time.perf_counter()
+                work(user_id)
+                latencies[n].append(time.perf_counter() - started)
+        except Exception as e:  # report, don't hang the barrier
+            errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    flat = sorted(x for per in latencies for x in per)
+    return elapsed, flat, errors
+
+
+def direct(path):
+    def sign(n):
+        con = db.connect(path)
+        return lambda user_id: con.execute(
+            "INSERT INTO signatures(user_id, initiative_id) VALUES (?, 1)", [user_id]
+        )
+    return sign
+
+
+def batched(path, writer):
+    def sign(n):
+        return lambda user_id: writer.submit(SIGN, user_id, 1)
+    return sign
+
+
+def report(name, total, elapsed, latencies, errors):
+    p = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    print(
+        f"{name:<8} {total / elapsed:>10.0f} sig/s   p50 {p[49] * 1000:7.2f} ms   "
+        f"p99 {p[98] * 1000:7.2f} ms   errors {len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--signatures", type=int, default=20000)
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--batch-delay", type=float, default=0.001)
+    args = parser.parse_args()
+
+    db.configure(synchronous=args.synchronous, busy_timeout=60000)
+    per_thread = args.signatures // args.threads
+    total = per_thread * args.threads
+    print(f"{total} signatures, {args.threads} threads, synchronous={args.synchronous}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "direct.db")
+        seed(path, total)
+        report("direct", total, *run(args.threads, per_thread, direct(path)))
+
+        path = os.path.join(tmp, "batched.db")
+        seed(path, total)
+        writer = SignatureWriter(path, args.batch_size, args.batch_delay, timeout=60)
+        report("batched", total, *run(args.threads, per_thread, batched(path, writer)))
+        stats = writer.stats()
+        print(f"         {stats['batches']} batches, avg {stats['avg_batch']:.1f}, max {stats['max_batch']}")
+
+
+if __name__ == "__main__":
+    main()
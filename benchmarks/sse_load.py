@@ -0,0 +1,133 @@
+"""Live signature counts (SSE) with many concurrent subscribers (live.py).
+
+Usage: python benchmarks/sse_load.py [--subscribers 10 100 1000] [--seconds 10]
+                                     [--writes-per-second 50] [--max-rate 2]
+
+A seeded throwaway database, the real /live/signatures endpoint through the
+Flask test client (one thread per subscriber) and a writer signing
+one hot initiative at a steady rate through change_signature(). For every
+subscriber count it reports the notifier's database queries (they should
+not grow with subscribers), the events delivered and the delay from commit
+to delivery.
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+
+
+def subscriber(client, target, deadline, committed, delays, received):
+    response = client.get(f"/live/signatures?ids={target}", buffered=False)
+    events = 0
+    try:
+        for chunk in response.response:
+            now = time.perf_counter()
+            for line in chunk.decode().splitlines():
+                if not line.startswith("data: "):
+                    continue
+                events += 1
+                for update in json.loads(line[6:]):
+                    at = committed.get(update["signatures"])
+                    if at is not None:
+                        delays.append(now - at)
+            if now >= deadline:
+                break
+    finally:
+        response.close()
+        received.append(events)
+
+
+def writer(app_module, target, signers, rate, deadline, committed):
+    interval = 1 / rate
+    with app_module.app.app_context():
+        count = db.query("SELECT signature_count FROM initiatives WHERE id = ?", [target])[0][0]
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if app_module.change_signature(next(signers), target, app_module.SIGN):
+                count += 1
+                committed[count] = time.perf_counter()
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+            db.close_connection()
+
+
+def run(app_module, target, signers, subscribers, seconds, rate):
+    notifier = app_module.count_notifier
+    before = notifier.stats()
+    committed, delays, received = {}, [], []
+    # Subscribers connect first; the writer starts once they are all listening
+    deadline = time.perf_counter() + seconds + 5
+    threads = [
+        threading.Thread(
+            target=subscriber,
+            args=(app_module.app.test_client(), target, deadline, committed, delays, received),
+        )
+        for _ in range(subscribers)
+    ]
+    for t in threads:
+        t.start()
+    while notifier.stats()["subscribers"] < subscribers:
+        time.sleep(0.05)
+
+    write_deadline = time.perf_counter() + seconds
+    writer(app_module, target, signers, rate, write_deadline, committed)
+    for t in threads:
+        t.join()
+
+    after = notifier.stats()
+    p = statistics.quantiles(delays, n=100) if len(delays) > 1 else [0] * 99
+    print(
+        f"{subscribers:>6} subscribers  {len(committed):>5} writes  "
+        f"{after['queries'] - before['queries']:>4} notifier queries  "
+        f"{sum(received):>7} events ({sum(received) / max(1, subscribers) / seconds:.1f}/s each)  "
+        f"delay p50 {p[49] * 1000:6.1f} ms  p99 {p[98] * 1000:6.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writes-per-second", type=float, default=50)
+    parser.add_argument("--max-rate", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Every write is a new signer, so the count only grows
+    users = int(args.writes_per_second * args.seconds * len(args.subscribers) * 1.2) + 100
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "live.db")
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "init.db.py"), "--db", path,
+             "--users", str(users), "--initiatives", "20", "--max-per-initiative", "0"],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        os.environ["FLASK_DATABASE"] = path
+        os.environ["FLASK_LIVE_MAX_RATE"] = str(args.max_rate)
+        # One process serves every subscriber here; lift the per-worker stream cap
+        os.environ["FLASK_LIVE_MAX_STREAMS"] = str(max(args.subscribers))
+        os.environ.setdefault("FLASK_PASSWORD_HASH_WORKERS", "0")
+        import app as app_module
+        app_module.LIVE_HEARTBEAT = 1  # let idle streams notice the deadline
+
+        with app_module.app.app_context():
+            target = db.query("SELECT id FROM initiatives WHERE active = 1 LIMIT 1")[0][0]
+        print(f"{args.writes_per_second:.0f} signatures/s for {args.seconds:.0f} s, "
+              f"at most {args.max_rate:g} updates/s")
+        signers = itertools.count(1)
+        for subscribers in args.subscribers:
+            run(app_module, target, signers, subscribers, args.seconds, args.writes_per_second)
+        db.reset_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import threading
+import weakref
+from collections import OrderedDict
+from flask import g
+import db
+
+
+class FragmentCache:
+    """Muistirajattu LRU-välimuisti renderöidyille sivun osille.
+
+    Avaimiin kuuluu tietokannan dataversio (db.data_version()), joten
+    kirjoitus mitätöi vanhat osat automaattisesti: niihin ei enää osuta ja
+    ne poistuvat LRU-järjestyksessä, kun tilaraja `max_bytes` täyttyy.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_render(self, key, render):
+        """Palauta välimuistissa oleva osa tai renderöi ja tallenna se."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value[0]
+            self._stats["misses"] += 1
+
+        # Rendered outside the lock; concurrent misses may render twice
+        html = render()
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return html
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (html, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class RoleCache:
+    """Käyttäjien ylläpito-oikeudet muistissa, ilman tietokantakyselyä per pyyntö.
+
+    invalidate() kasvattaa sukupolvinumeroa, jolloin ennen mitätöintiä
+    aloitettu haku ei voi tallentaa vanhaa arvoa. Muiden prosessien
+    muutokset huomataan tietokannan roolien versioleimasta
+    (db.roles_version()), joka luetaan vain, kun yhteyden PRAGMA
+    data_version kertoo jonkin toisen yhteyden kirjoittaneen tietokantaan.
+    Tarkistus tehdään enintään kerran pyyntöä kohden.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles = {}
+        self._generation = 0
+        self._version = None
+        # connection -> PRAGMA data_version when last checked; entries go with their connection
+        self._seen = weakref.WeakKeyDictionary()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "version_checks": 0}
+
+    def is_admin(self, user_id):
+        """Onko käyttäjä ylläpitäjä (poistettu käyttäjä ei ole)."""
+        self._check_version()
+        with self._lock:
+            cached = self._roles.get(user_id)
+            if cached is not None:
+                self._stats["hits"] += 1
+                return cached
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        rows = db.query("SELECT is_admin FROM users WHERE id = ?", [user_id])
+        is_admin = bool(rows) and rows[0]["is_admin"] == 1
+        with self._lock:
+            if self._generation == generation:
+                self._roles[user_id] = is_admin
+        return is_admin
+
+    def invalidate(self, user_id):
+        """Unohda käyttäjän rooli heti (tämän prosessin roolimuutokset)."""
+        with self._lock:
+            self._generation += 1
+            self._roles.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def _check_version(self):
+        # Once per request: admin_required and the page template both ask
+        if g.get("roles_checked"):
+            return
+        g.roles_checked = True
+        # PRAGMA data_version only changes when another connection commits,
+        # which costs no query; local role changes call invalidate() instead
+        con = db.get_connection()
+        data_version = con.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            if self._seen.get(con) == data_version:
+                return
+        version = db.roles_version()
+        with self._lock:
+            self._stats["version_checks"] += 1
+            if version != self._version:
+                self._roles.clear()
+                self._generation += 1
+                self._version = version
+            self._seen[con] = data_version
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._roles)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -1,38 +1,897 @@
+import hashlib
+import logging
+import os
+import queue
 import sqlite3
-from flask import g
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
 
-DB_FILE = "database.db"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(BASE_DIR, "database.db")  # app.py: DATABASE-asetus
+SCHEMA_FILE = os.path.join(BASE_DIR, "schema.sql")
+DEFAULT_IMAGE_PATH = os.path.join(BASE_DIR, "static", "kukka_optimized_50.png")
+
+# Yhteyksien asetukset; muutetaan configure()-funktiolla (app.py: SQLITE_*-asetukset)
+OPTIONS = {
+    "pool_size": 8,                     # yhteyksiä enintään prosessia kohden
+    "pool_timeout": 10.0,               # sekuntia odotusta vapaaseen yhteyteen
+    "journal_mode": "WAL",              # lukijat eivät odota kirjoittajaa
+    "busy_timeout": 5000,               # ms odotusta kirjoituslukkoon ennen "database is locked"
+    "synchronous": "NORMAL",            # WAL:n kanssa turvallinen, yksi fsync per checkpoint
+    "cached_statements": 256,           # valmisteltujen lauseiden välimuisti per yhteys
+    "mmap_size": 64 * 1024 * 1024,      # tavua muistiin mapattua tietokantaa
+    "instrument": False,                # mittaa lauseiden määrä ja kesto pyynnöittäin
+    "slow_query_ms": 100.0,             # tätä hitaammat lauseet suunnitelmineen lokiin
+    "repeat_threshold": 5,              # näin monta samaa lausetta pyynnössä: N+1-varoitus
+}
+
+# Hitaat lauseet (EXPLAIN QUERY PLAN mukana) ja N+1-varoitukset
+slow_query_log = logging.getLogger("db.slow_queries")
+
+def configure(**options):
+    """Päivitä yhteysasetukset. Uudet asetukset koskevat uusia yhteyksiä (pooli nollataan)."""
+    unknown = set(options) - set(OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown database options: {', '.join(sorted(unknown))}")
+    OPTIONS.update(options)
+    reset_pool()
+
+class Connection(sqlite3.Connection):
+    """Yhteys, johon voi viitata heikosti (yhteyskohtainen tila välimuisteissa, ks. cache.py)."""
+
+
+def connect(db_file=None):
+    """Avaa uusi, asetusten mukaan viritetty yhteys."""
+    con = sqlite3.connect(
+        db_file or DB_FILE,
+        factory=Connection,
+        check_same_thread=False,  # the pool hands connections between threads
+        cached_statements=OPTIONS["cached_statements"],
+        isolation_level=None,     # autocommit; transaction() issues BEGIN/COMMIT itself
+    )
+    con.row_factory = sqlite3.Row
+    con.execute(f"PRAGMA busy_timeout = {int(OPTIONS['busy_timeout'])}")
+    con.execute(f"PRAGMA journal_mode = {OPTIONS['journal_mode']}")
+    con.execute(f"PRAGMA synchronous = {OPTIONS['synchronous']}")
+    con.execute(f"PRAGMA mmap_size = {int(OPTIONS['mmap_size'])}")
+    con.execute("PRAGMA foreign_keys = ON")
+    return con
+
+class ConnectionPool:
+    """Rajattu joukko uudelleenkäytettäviä yhteyksiä yhdelle tietokannalle.
+
+    LIFO-jono antaa juuri vapautuneen (lämpimän) yhteyden seuraavalle
+    pyynnölle. Kun kaikki yhteydet ovat käytössä, checkout odottaa.
+    """
+
+    def __init__(self, db_file, size, timeout):
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def checkout(self):
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            con = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    con = connect(self.db_file)
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    con = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError("connection pool exhausted") from None
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time_total"] += waited
+                    self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        with self._lock:
+            self._stats["checkouts"] += 1
+        return con
+
+    def checkin(self, con):
+        if con.in_transaction:
+            con.rollback()
+        self._idle.put(con)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Prosessin yhteyspooli. Luodaan uudelleen forkin jälkeen tai jos DB_FILE vaihtuu."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.pid != os.getpid() or pool.db_file != DB_FILE:
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid() or _pool.db_file != DB_FILE:
+                _pool = ConnectionPool(DB_FILE, OPTIONS["pool_size"], OPTIONS["pool_timeout"])
+            pool = _pool
+    return pool
+
+def reset_pool():
+    """Sulje vapaat yhteydet ja aloita uusi pooli (esim. asetusten muuttuessa)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+def pool_stats():
+    """Poolin tilastot: checkoutit, odotukset ja niiden kesto."""
+    return get_pool().stats()
 
 def get_connection():
     if "db" not in g:
-        con = sqlite3.connect(DB_FILE)
-        con.row_factory = sqlite3.Row
-        con.execute("PRAGMA foreign_keys = ON")
-        g.db = con
+        pool = get_pool()
+        g.db = pool.checkout()
+        g.db_pool = pool
     return g.db
 
 def execute(sql, params=None):
-    """Suorita SQL-komento (INSERT, UPDATE, DELETE). Palauttaa viimeisen rivin id."""
+    """Suorita SQL-komento (INSERT, UPDATE, DELETE). Palauttaa viimeisen rivin id.
+
+    Transaktion ulkopuolella komento vahvistetaan heti, transaction()-lohkossa
+    vasta lohkon lopussa.
+    """
+    con = get_connection()
+    return _execute(con, sql, params or []).lastrowid
+
+def execute_many(sql, rows):
+    """Suorita sama komento jokaiselle parametririville yhdessä transaktiossa. Palauttaa muutettujen rivien määrän."""
+    with transaction() as con:
+        cur = _execute(con, sql, rows, many=True)
+    return cur.rowcount
+
+@contextmanager
+def transaction():
+    """Yksi transaktio (BEGIN IMMEDIATE ... COMMIT), poikkeuksella ROLLBACK.
+
+    Kaikki lohkon execute()- ja query()-kutsut kuuluvat samaan transaktioon,
+    joten looginen operaatio vahvistetaan kerralla. Sisäkkäinen transaction()
+    liittyy ulompaan.
+    """
     con = get_connection()
-    cur = con.cursor()
-    if params is None:
-        params = []
-    result = cur.execute(sql, params)
-    con.commit()
-    return result.lastrowid
+    if g.get("db_in_transaction"):
+        yield con
+        return
+    # IMMEDIATE takes the write lock up front, so busy_timeout applies here
+    # instead of failing with SQLITE_BUSY when a read later upgrades to a write
+    _execute(con, "BEGIN IMMEDIATE")
+    g.db_in_transaction = True
+    try:
+        yield con
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    else:
+        _execute(con, "COMMIT")
+    finally:
+        g.db_in_transaction = False
 
 def query(sql, params=None):
     """Suorita SQL SELECT ja palauta rivit listana (sqlite3.Row)."""
     con = get_connection()
-    cur = con.cursor()
-    if params is None:
-        params = []
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    return rows
+    return _execute(con, sql, params or [], fetch=True)
+
+def stream(sql, params=None, size=1000):
+    """Iteroi kyselyn rivit erissä (fetchmany): muistinkäyttö ei riipu rivimäärästä.
+
+    Käytä Flaskin stream_with_context()-generaattorissa, jotta yhteys pysyy
+    pyynnön käytössä vastauksen loppuun asti.
+    """
+    cur = _execute(get_connection(), sql, params or [])
+    try:
+        while rows := cur.fetchmany(size):
+            yield from rows
+    finally:
+        cur.close()
+
+def _execute(con, sql, params=(), fetch=False, many=False):
+    # The single path to SQLite for the helpers above. Without
+    # instrumentation it costs one dict lookup per statement.
+    if not OPTIONS["instrument"]:
+        cur = con.executemany(sql, params) if many else con.execute(sql, params)
+        return cur.fetchall() if fetch else cur
+    started = time.perf_counter()
+    cur = con.executemany(sql, params) if many else con.execute(sql, params)
+    result = cur.fetchall() if fetch else cur
+    _record(con, sql, None if many else params, time.perf_counter() - started)
+    return result
+
+_EXPLAINABLE = {"SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+
+def _record(con, sql, params, elapsed):
+    stats = g.get("db_stats")
+    if stats is None:
+        stats = g.db_stats = {"count": 0, "time": 0.0, "statements": []}
+    stats["count"] += 1
+    stats["time"] += elapsed
+    stats["statements"].append((sql, elapsed))
+
+    if elapsed * 1000 >= OPTIONS["slow_query_ms"]:
+        plan = ""
+        if params is not None and sql.split(None, 1)[0].upper() in _EXPLAINABLE:
+            rows = con.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            plan = "\n".join(f"  {row['detail']}" for row in rows)
+        slow_query_log.warning(
+            "%.1f ms %s: %s\n%s",
+            elapsed * 1000,
+            request.path if has_request_context() else "-",
+            " ".join(sql.split()),
+            plan,
+        )
+
+def request_stats():
+    """Pyynnön SQL-tilastot instrumentoinnin ollessa päällä, muuten None.
+
+    Palauttaa lauseiden määrän, kokonaisajan (ms), jokaisen lauseen keston
+    ja samana toistuneet lauseet (mahdollinen N+1-kysely).
+    """
+    stats = g.get("db_stats")
+    if stats is None:
+        return None
+    counts = Counter(sql for sql, _ in stats["statements"])
+    return {
+        "count": stats["count"],
+        "time_ms": stats["time"] * 1000,
+        "statements": [(" ".join(sql.split()), elapsed * 1000) for sql, elapsed in stats["statements"]],
+        "repeated": {
+            " ".join(sql.split()): n for sql, n in counts.items() if n >= OPTIONS["repeat_threshold"]
+        },
+    }
 
 def close_connection(e=None):
-    """Sulje yhteys, jos olemassa (kutsutaan app.teardown_appcontext)."""
+    """Palauta yhteys pooliin, jos olemassa (kutsutaan app.teardown_appcontext)."""
     db = g.pop("db", None)
+    pool = g.pop("db_pool", None)
+    g.pop("db_in_transaction", None)
+    g.pop("db_stats", None)
     if db is not None:
-        db.close()
+        pool.checkin(db)
+
+def data_version():
+    """Globaali dataversio: kasvaa jokaisella aloitelistoihin vaikuttavalla muutoksella."""
+    return query("SELECT value FROM meta WHERE key = 'data_version'")[0]["value"]
+
+def roles_version():
+    """Roolien versioleima, jaettu kaikkien prosessien kesken."""
+    return query("SELECT value FROM meta WHERE key = 'roles_version'")[0]["value"]
+
+def has_fulltext_search():
+    """Onko tietokannassa FTS5-hakuindeksi (migraatio 4)."""
+    rows = query("SELECT 1 FROM sqlite_master WHERE name='initiatives_fts'")
+    return bool(rows)
+
+def signature_count_drift():
+    """Palauta aloitteet, joiden signature_count ei vastaa signatures-taulua."""
+    return query(
+        """
+        SELECT i.id, i.signature_count AS stored, COUNT(s.id) AS actual
+        FROM initiatives i
+        LEFT JOIN signatures s ON s.initiative_id = i.id
+        GROUP BY i.id
+        HAVING stored != actual
+        """
+    )
+
+def rebuild_signature_counts():
+    """Laske signature_count uudelleen kaikille aloitteille. Palauttaa korjattujen rivien määrän."""
+    with transaction():
+        drifted = len(signature_count_drift())
+        execute(
+            """
+            UPDATE initiatives SET signature_count = (
+                SELECT COUNT(*) FROM signatures s WHERE s.initiative_id = initiatives.id
+            )
+            """
+        )
+    return drifted
+
+# Aloite on avoinna päättymispäivänsä loppuun (UTC), kuten datetime('now')
+EXPIRED = "active = 1 AND end_date < date('now')"
+
+def has_expired_initiatives(con):
+    """Onko avoimia aloitteita, joiden päättymispäivä on ohitettu (lukukysely)."""
+    return con.execute(f"SELECT EXISTS (SELECT 1 FROM initiatives WHERE {EXPIRED})").fetchone()[0] == 1
+
+def close_expired_initiatives(con):
+    """Sulje kaikki vanhentuneet aloitteet yhdellä UPDATE-lauseella. Palauttaa suljettujen määrän."""
+    return con.execute(f"UPDATE initiatives SET active = 0 WHERE {EXPIRED}").rowcount
+
+def backfill_signature_rollups(con):
+    """Laske signature_rollups kokonaan uudelleen signatures-taulusta (annetulla yhteydellä)."""
+    con.execute("DELETE FROM signature_rollups")
+    con.execute(
+        """
+        INSERT INTO signature_rollups (initiative_id, hour, count)
+        SELECT initiative_id, strftime('%Y-%m-%d %H:00:00', signed_at) AS hour, COUNT(*)
+        FROM signatures
+        WHERE hour IS NOT NULL
+        GROUP BY initiative_id, hour
+        """
+    )
+
+# Ylläpitonäkymän kokonaismäärät meta-taulussa (total_*), ylläpidetään triggereillä
+TOTALS = ("open", "closed", "deleted", "signatures", "users", "admins")
+
+# Aloitteen laskuri total_open/closed/deleted (NULL-sarakkeet kuten epätosi)
+_INITIATIVE_TOTAL = (
+    "CASE WHEN {row}.deleted THEN 'total_deleted' "
+    "WHEN {row}.active THEN 'total_open' ELSE 'total_closed' END"
+)
+
+def backfill_totals(con):
+    """Laske kokonaismäärät uudelleen tauluista (annetulla yhteydellä)."""
+    con.executemany(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, 0)", [(f"total_{name}",) for name in TOTALS]
+    )
+    con.execute(
+        f"""
+        INSERT OR REPLACE INTO meta (key, value)
+        SELECT {_INITIATIVE_TOTAL.format(row="initiatives")}, COUNT(*) FROM initiatives GROUP BY 1
+        """
+    )
+    con.execute(
+        """
+        INSERT OR REPLACE INTO meta (key, value)
+        SELECT 'total_signatures', COALESCE(SUM(signature_count), 0) FROM initiatives
+        UNION ALL SELECT 'total_users', COUNT(*) FROM users
+        UNION ALL SELECT 'total_admins', COUNT(*) FROM users WHERE is_admin = 1
+        """
+    )
+
+def totals():
+    """Kokonaismäärät laskureista yhdellä indeksihaulla: {nimi: määrä}."""
+    rows = query(
+        f"SELECT key, value FROM meta WHERE key IN ({', '.join('?' * len(TOTALS))})",
+        [f"total_{name}" for name in TOTALS],
+    )
+    return {row["key"][len("total_"):]: row["value"] for row in rows}
+
+def rebuild_signature_rollups():
+    """Rakenna tuntikohtaiset yhteenvedot uudelleen. Palauttaa rivien määrän."""
+    with transaction() as con:
+        backfill_signature_rollups(con)
+    return query("SELECT COUNT(*) AS n FROM signature_rollups")[0]["n"]
+
+
+# --- MIGRATIONS ---
+# Numeroidut migraatiot tuovat vanhan tietokannan schema.sql:n tasolle.
+# Jokainen migraatio on idempotentti, koska uusi tietokanta luodaan suoraan
+# schema.sql:stä ja ajaa silti kaikki migraatiot.
+
+def _columns(con, table):
+    return {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(con, table, column, definition):
+    if column not in _columns(con, table):
+        con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_1_baseline_columns(con):
+    """Sarakkeet, jotka puuttuivat vanhasta schema.sql:stä."""
+    _add_column(con, "users", "first_name", "TEXT")
+    _add_column(con, "users", "last_name", "TEXT")
+    _add_column(con, "initiatives", "start_date", "TEXT")
+    _add_column(con, "initiatives", "end_date", "TEXT")
+
+def _migration_2_signature_counts(con):
+    """Ylläpidetty allekirjoituslaskuri ja sen triggerit."""
+    _add_column(con, "initiatives", "signature_count", "INTEGER NOT NULL DEFAULT 0")
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS signatures_count_insert AFTER INSERT ON signatures
+        BEGIN
+            UPDATE initiatives SET signature_count = signature_count + 1
+            WHERE id = NEW.initiative_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS signatures_count_delete AFTER DELETE ON signatures
+        BEGIN
+            UPDATE initiatives SET signature_count = signature_count - 1
+            WHERE id = OLD.initiative_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        UPDATE initiatives SET signature_count = (
+            SELECT COUNT(*) FROM signatures s WHERE s.initiative_id = initiatives.id
+        )
+        """
+    )
+
+def _migration_3_indexes(con):
+    """Poista tuplat allekirjoituksista, lisää UNIQUE ja hakujen indeksit."""
+    # Keep the earliest signature of each (user, initiative) pair;
+    # the delete trigger keeps signature_count in step.
+    con.execute(
+        """
+        DELETE FROM signatures WHERE id NOT IN (
+            SELECT MIN(id) FROM signatures GROUP BY user_id, initiative_id
+        )
+        """
+    )
+    con.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS signatures_user_initiative "
+        "ON signatures(user_id, initiative_id)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS signatures_initiative_signed "
+        "ON signatures(initiative_id, signed_at, user_id)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS initiatives_listing "
+        "ON initiatives(active, deleted, created_at)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS initiatives_creator "
+        "ON initiatives(creator_id, deleted)"
+    )
+
+def _migration_4_fulltext_search(con):
+    """FTS5-hakuindeksi (otsikko, kuvaus, tekijä). Ohitetaan, jos FTS5 puuttuu."""
+    if con.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='initiatives_fts'"
+    ).fetchone():
+        return
+    try:
+        # remove_diacritics 0 keeps å/ä/ö distinct from a/o, as they are
+        # separate letters in Finnish; prefix indexes make "aloit*" cheap.
+        con.execute(
+            """
+            CREATE VIRTUAL TABLE initiatives_fts USING fts5(
+                title, description, username,
+                tokenize = "unicode61 remove_diacritics 0",
+                prefix = '2 3'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search falls back to LIKE
+        return
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS initiatives_fts_insert AFTER INSERT ON initiatives
+        BEGIN
+            INSERT INTO initiatives_fts(rowid, title, description, username)
+            SELECT NEW.id, NEW.title, NEW.description, u.username
+            FROM users u WHERE u.id = NEW.creator_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS initiatives_fts_update
+        AFTER UPDATE OF title, description, creator_id ON initiatives
+        BEGIN
+            DELETE FROM initiatives_fts WHERE rowid = OLD.id;
+            INSERT INTO initiatives_fts(rowid, title, description, username)
+            SELECT NEW.id, NEW.title, NEW.description, u.username
+            FROM users u WHERE u.id = NEW.creator_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS initiatives_fts_delete AFTER DELETE ON initiatives
+        BEGIN
+            DELETE FROM initiatives_fts WHERE rowid = OLD.id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_username AFTER UPDATE OF username ON users
+        BEGIN
+            UPDATE initiatives_fts SET username = NEW.username
+            WHERE rowid IN (SELECT id FROM initiatives WHERE creator_id = NEW.id);
+        END
+        """
+    )
+    con.execute(
+        """
+        INSERT INTO initiatives_fts(rowid, title, description, username)
+        SELECT i.id, i.title, i.description, u.username
+        FROM initiatives i JOIN users u ON i.creator_id = u.id
+        """
+    )
+
+def _migration_5_pagination_indexes(con):
+    """Indeksit keyset-sivutukselle (created_at, id)."""
+    con.execute("DROP INDEX IF EXISTS initiatives_creator")
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS initiatives_creator_created "
+        "ON initiatives(creator_id, deleted, created_at)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS initiatives_created ON initiatives(created_at)"
+    )
+
+def _migration_6_image_store(con):
+    """Kuvat omaan sisältöosoitteiseen images-tauluun, oletuskuva jaetaan (NULL)."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        )
+        """
+    )
+    _add_column(con, "initiatives", "image_hash", "TEXT REFERENCES images(hash)")
+    con.execute("CREATE INDEX IF NOT EXISTS initiatives_image ON initiatives(image_hash)")
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS images_release_update AFTER UPDATE OF image_hash ON initiatives
+        WHEN OLD.image_hash IS NOT NULL AND OLD.image_hash IS NOT NEW.image_hash
+        BEGIN
+            DELETE FROM images WHERE hash = OLD.image_hash
+              AND NOT EXISTS (SELECT 1 FROM initiatives WHERE image_hash = OLD.image_hash);
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS images_release_delete AFTER DELETE ON initiatives
+        WHEN OLD.image_hash IS NOT NULL
+        BEGIN
+            DELETE FROM images WHERE hash = OLD.image_hash
+              AND NOT EXISTS (SELECT 1 FROM initiatives WHERE image_hash = OLD.image_hash);
+        END
+        """
+    )
+
+    if "image" not in _columns(con, "initiatives"):
+        return
+    with open(DEFAULT_IMAGE_PATH, "rb") as f:
+        default_image = f.read()
+    # Move the BLOBs one row at a time so memory stays bounded
+    last_id = 0
+    while True:
+        row = con.execute(
+            "SELECT id, image FROM initiatives WHERE id > ? AND image IS NOT NULL ORDER BY id LIMIT 1",
+            [last_id],
+        ).fetchone()
+        if row is None:
+            break
+        last_id, data = row
+        if data != default_image:
+            digest = hashlib.sha256(data).hexdigest()
+            con.execute("INSERT OR IGNORE INTO images (hash, data) VALUES (?, ?)", [digest, data])
+            con.execute("UPDATE initiatives SET image_hash = ? WHERE id = ?", [digest, last_id])
+    try:
+        con.execute("ALTER TABLE initiatives DROP COLUMN image")
+    except sqlite3.OperationalError:
+        # SQLite < 3.35 has no DROP COLUMN; at least release the bytes
+        con.execute("UPDATE initiatives SET image = NULL")
+
+def _migration_7_image_mime(con):
+    """Tallennetun kuvan MIME-tyyppi, päätelty kuvan sisällöstä."""
+    from images import sniff_mime
+
+    _add_column(con, "images", "mime", "TEXT NOT NULL DEFAULT 'application/octet-stream'")
+    rows = con.execute(
+        "SELECT hash FROM images WHERE mime = 'application/octet-stream'"
+    ).fetchall()
+    for (digest,) in rows:
+        head = con.execute("SELECT substr(data, 1, 16) FROM images WHERE hash = ?", [digest]).fetchone()[0]
+        con.execute("UPDATE images SET mime = ? WHERE hash = ?", [sniff_mime(head), digest])
+
+def _migration_8_image_variants(con):
+    """Pienennökset (thumb/detail) WebP- ja JPEG-muodoissa, ks. images.py."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS image_variants (
+            hash TEXT NOT NULL REFERENCES images(hash) ON DELETE CASCADE,
+            size TEXT NOT NULL,
+            format TEXT NOT NULL,
+            mime TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (hash, size, format)
+        )
+        """
+    )
+
+def _migration_9_data_version(con):
+    """Globaali dataversio välimuistien avaimeksi, ylläpidetään triggereillä."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+    for name, event in (
+        ("initiatives_version_insert", "AFTER INSERT ON initiatives"),
+        ("initiatives_version_update", "AFTER UPDATE ON initiatives"),
+        ("initiatives_version_delete", "AFTER DELETE ON initiatives"),
+        ("users_version_username", "AFTER UPDATE OF username ON users"),
+    ):
+        con.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event}
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+            END
+            """
+        )
+
+def _migration_10_roles_version(con):
+    """Roolien versioleima: kasvaa, kun ylläpito-oikeus muuttuu tai käyttäjä poistetaan."""
+    con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('roles_version', 0)")
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_roles_update AFTER UPDATE OF is_admin ON users
+        WHEN OLD.is_admin IS NOT NEW.is_admin
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'roles_version';
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_roles_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'roles_version';
+        END
+        """
+    )
+
+def _migration_11_signature_rollups(con):
+    """Tuntikohtaiset allekirjoitusmäärät triggereillä ja olemassa olevan datan täyttö."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS signature_rollups (
+            initiative_id INTEGER NOT NULL REFERENCES initiatives(id) ON DELETE CASCADE,
+            hour TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (initiative_id, hour)
+        ) WITHOUT ROWID
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS signature_rollups_hour ON signature_rollups(hour, initiative_id, count)"
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS signatures_rollup_insert AFTER INSERT ON signatures
+        WHEN strftime('%Y-%m-%d %H:00:00', NEW.signed_at) IS NOT NULL
+        BEGIN
+            INSERT INTO signature_rollups (initiative_id, hour, count)
+            VALUES (NEW.initiative_id, strftime('%Y-%m-%d %H:00:00', NEW.signed_at), 1)
+            ON CONFLICT (initiative_id, hour) DO UPDATE SET count = count + 1;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS signatures_rollup_delete AFTER DELETE ON signatures
+        WHEN strftime('%Y-%m-%d %H:00:00', OLD.signed_at) IS NOT NULL
+        BEGIN
+            UPDATE signature_rollups SET count = count - 1
+            WHERE initiative_id = OLD.initiative_id
+              AND hour = strftime('%Y-%m-%d %H:00:00', OLD.signed_at);
+            DELETE FROM signature_rollups
+            WHERE initiative_id = OLD.initiative_id
+              AND hour = strftime('%Y-%m-%d %H:00:00', OLD.signed_at)
+              AND count <= 0;
+        END
+        """
+    )
+    backfill_signature_rollups(con)
+
+def _migration_12_row_versions(con):
+    """Aloitekohtainen versio (initiatives.version) JSON-rajapinnan ETageja varten."""
+    _add_column(con, "initiatives", "version", "INTEGER NOT NULL DEFAULT 0")
+    # The signature counters bump the version in the same UPDATE, so the
+    # generic trigger below does not update the row a second time
+    con.execute("DROP TRIGGER IF EXISTS signatures_count_insert")
+    con.execute("DROP TRIGGER IF EXISTS signatures_count_delete")
+    con.execute(
+        """
+        CREATE TRIGGER signatures_count_insert AFTER INSERT ON signatures
+        BEGIN
+            UPDATE initiatives SET signature_count = signature_count + 1, version = version + 1
+            WHERE id = NEW.initiative_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER signatures_count_delete AFTER DELETE ON signatures
+        BEGIN
+            UPDATE initiatives SET signature_count = signature_count - 1, version = version + 1
+            WHERE id = OLD.initiative_id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS initiatives_row_version AFTER UPDATE ON initiatives
+        WHEN NEW.version = OLD.version
+        BEGIN
+            UPDATE initiatives SET version = version + 1 WHERE id = NEW.id;
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS users_initiatives_version AFTER UPDATE OF username ON users
+        BEGIN
+            UPDATE initiatives SET version = version + 1 WHERE creator_id = NEW.id;
+        END
+        """
+    )
+
+def _migration_13_deadlines(con):
+    """Indeksi avoimien aloitteiden päättymispäiville (määräaikojen sulkija)."""
+    con.execute(
+        """
+        CREATE INDEX IF NOT EXISTS initiatives_deadline
+            ON initiatives(active, end_date)
+        """
+    )
+
+def _migration_14_admin_index(con):
+    """Osittainen indeksi ylläpitäjille: ylläpitonäkymän suodatin ja laskuri ilman koko taulun lukua."""
+    con.execute(
+        """
+        CREATE INDEX IF NOT EXISTS users_admins
+            ON users(is_admin) WHERE is_admin = 1
+        """
+    )
+
+def _migration_15_signature_sort(con):
+    """Indeksi ylläpitonäkymän järjestykselle allekirjoitusmäärän mukaan (keyset-sivutus)."""
+    con.execute(
+        """
+        CREATE INDEX IF NOT EXISTS initiatives_signatures
+            ON initiatives(signature_count, id)
+        """
+    )
+
+def _migration_16_totals(con):
+    """Ylläpitonäkymän kokonaismäärät meta-tauluun, ylläpidetään triggereillä."""
+    backfill_totals(con)
+    new, old = _INITIATIVE_TOTAL.format(row="NEW"), _INITIATIVE_TOTAL.format(row="OLD")
+    triggers = {
+        "initiatives_totals_insert": f"""AFTER INSERT ON initiatives
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = {new};
+                UPDATE meta SET value = value + NEW.signature_count WHERE key = 'total_signatures';
+            END""",
+        "initiatives_totals_delete": f"""AFTER DELETE ON initiatives
+            BEGIN
+                UPDATE meta SET value = value - 1 WHERE key = {old};
+                UPDATE meta SET value = value - OLD.signature_count WHERE key = 'total_signatures';
+            END""",
+        "initiatives_totals_state": f"""AFTER UPDATE OF active, deleted ON initiatives
+            WHEN {old} IS NOT {new}
+            BEGIN
+                UPDATE meta SET value = value - 1 WHERE key = {old};
+                UPDATE meta SET value = value + 1 WHERE key = {new};
+            END""",
+        "initiatives_totals_signatures": """AFTER UPDATE OF signature_count ON initiatives
+            WHEN OLD.signature_count IS NOT NEW.signature_count
+            BEGIN
+                UPDATE meta SET value = value + NEW.signature_count - OLD.signature_count
+                WHERE key = 'total_signatures';
+            END""",
+        "users_totals_insert": """AFTER INSERT ON users
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'total_users';
+                UPDATE meta SET value = value + (NEW.is_admin IS 1) WHERE key = 'total_admins';
+            END""",
+        "users_totals_delete": """AFTER DELETE ON users
+            BEGIN
+                UPDATE meta SET value = value - 1 WHERE key = 'total_users';
+                UPDATE meta SET value = value - (OLD.is_admin IS 1) WHERE key = 'total_admins';
+            END""",
+        "users_totals_admin": """AFTER UPDATE OF is_admin ON users
+            WHEN OLD.is_admin IS NOT NEW.is_admin
+            BEGIN
+                UPDATE meta SET value = value + (NEW.is_admin IS 1) - (OLD.is_admin IS 1)
+                WHERE key = 'total_admins';
+            END""",
+    }
+    for name, body in triggers.items():
+        con.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+MIGRATIONS = [
+    (1, _migration_1_baseline_columns),
+    (2, _migration_2_signature_counts),
+    (3, _migration_3_indexes),
+    (4, _migration_4_fulltext_search),
+    (5, _migration_5_pagination_indexes),
+    (6, _migration_6_image_store),
+    (7, _migration_7_image_mime),
+    (8, _migration_8_image_variants),
+    (9, _migration_9_data_version),
+    (10, _migration_10_roles_version),
+    (11, _migration_11_signature_rollups),
+    (12, _migration_12_row_versions),
+    (13, _migration_13_deadlines),
+    (14, _migration_14_admin_index),
+    (15, _migration_15_signature_sort),
+    (16, _migration_16_totals),
+]
+
+def migrate(db_file=None):
+    """Luo tietokanta schema.sql:stä tai aja puuttuvat migraatiot. Palauttaa skeemaversion."""
+    con = sqlite3.connect(db_file or DB_FILE, isolation_level=None)
+    try:
+        con.execute("PRAGMA foreign_keys = ON")
+        fresh = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='users'"
+        ).fetchone() is None
+        if fresh:
+            with open(SCHEMA_FILE, encoding="utf-8") as f:
+                con.executescript(f.read())
+
+        for number, migration in MIGRATIONS:
+            # BEGIN IMMEDIATE serialises concurrently starting workers;
+            # the version is re-read under the write lock.
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                if con.execute("PRAGMA user_version").fetchone()[0] >= number:
+                    con.execute("ROLLBACK")
+                    continue
+                migration(con)
+                con.execute(f"PRAGMA user_version = {number}")
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        return con.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        con.close()
@@ -0,0 +1,78 @@
+import os
+import threading
+import db
+from lazy_start import start_once, start_thread
+
+
+class DeadlineSweeper:
+    """Sulkee aloitteet, joiden päättymispäivä on ohitettu.
+
+    Yksi säie tarkistaa `interval` sekunnin välein indeksistä (active, end_date),
+    onko vanhentuneita avoimia aloitteita, ja sulkee ne kaikki yhdellä
+    UPDATE-lauseella. Triggerit kasvattavat samalla data_versionia ja
+    aloitteiden versioita, joten välimuistit vanhenevat itsestään.
+    Kirjoituslukko otetaan vain, kun suljettavaa on.
+    """
+
+    def __init__(self, db_file=None, interval=60.0):
+        self.db_file = db_file
+        self.interval = interval
+        self.pid = None
+        self._lock = threading.Lock()
+        self._stop = None
+        self._stats = {"ticks": 0, "sweeps": 0, "closed": 0, "errors": 0}
+
+    def start(self):
+        """Käynnistä säie tässä prosessissa, ellei se jo ole käynnissä (interval 0: ei säiettä)."""
+        if self.interval:
+            start_once(self, self._start)
+
+    def close(self):
+        """Pysäytä säie (start() käynnistää uuden)."""
+        with self._lock:
+            if self._stop is not None and self.pid == os.getpid():
+                self._stop.set()
+            self.pid = None
+
+    def _start(self):
+        stop = self._stop = threading.Event()
+        start_thread(lambda: self._run(stop), "deadline-sweeper")
+
+    def sweep(self, con):
+        """Sulje vanhentuneet aloitteet annetulla yhteydellä. Palauttaa suljettujen määrän."""
+        with self._lock:
+            self._stats["ticks"] += 1
+        if not db.has_expired_initiatives(con):
+            return 0
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            closed = db.close_expired_initiatives(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["closed"] += closed
+        return closed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["interval"] = self.interval
+        stats["running"] = self.pid == os.getpid()
+        return stats
+
+    def _run(self, stop):
+        con = db.connect(self.db_file or db.DB_FILE)
+        try:
+            while not stop.is_set():
+                # First sweep right away: deadlines may have passed while we were down
+                try:
+                    self.sweep(con)
+                except Exception:  # e.g. SQLITE_BUSY; retry on the next tick
+                    with self._lock:
+                        self._stats["errors"] += 1
+                stop.wait(self.interval)
+        finally:
+            con.close()
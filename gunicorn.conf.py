@@ -0,0 +1,30 @@
+"""Gunicorn settings: several preforked workers sharing one SQLite database.
+
+    FLASK_SECRET_KEY=... gunicorn -c gunicorn.conf.py
+
+The app is imported (and the database migrated) once in the master process,
+then every worker warms up right after the fork (app.warm_up). Override with
+the usual environment variables: GUNICORN_BIND, WEB_CONCURRENCY (workers)
+and GUNICORN_THREADS.
+"""
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Threaded workers: live signature streams (SSE) each hold a thread, so the
+# app caps them per worker at FLASK_LIVE_MAX_STREAMS (default 8); keep that
+# below the threads, or the streams leave no thread for other requests
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Database connections, background threads and process pools are per
+    # process; they are created here, not inherited from the master
+    from app import warm_up
+
+    timings = warm_up()
+    server.log.info("Worker %s warmed up: %s", worker.pid,
+                    ", ".join(f"{step} {ms} ms" for step, ms in timings.items()))
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from lazy_start import start_once
+
+try:
+    import bcrypt
+except ImportError:  # only needed when the method is "bcrypt:<rounds>"
+    bcrypt = None
+
+# Werkzeug method strings ("scrypt:32768:8:1", "pbkdf2:sha256:600000") or
+# "bcrypt:<rounds>". Stored hashes made with any other method are rehashed
+# on the next successful login.
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HasherBusy(Exception):
+    """Salasanatarkistuksia on jonossa enimmäismäärä; pyyntö hylätään."""
+
+
+def hash_method(password_hash):
+    """Tallennetun tiivisteen menetelmä samassa muodossa kuin asetus."""
+    if password_hash.startswith("$2"):
+        return f"bcrypt:{int(password_hash.split('$')[2])}"
+    return password_hash.partition("$")[0]
+
+
+def expand_method(method):
+    """Asetuksen menetelmä täysin parametrein, samassa muodossa kuin hash_method().
+
+    Lyhyet muodot ("scrypt", "pbkdf2", "pbkdf2:sha512", "bcrypt") saavat
+    Werkzeugin ja bcryptin oletukset ilman, että tiivistettä lasketaan.
+    """
+    name, _, args = method.partition(":")
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    if name == "pbkdf2" and args.count(":") == 0:
+        return f"pbkdf2:{args or 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    if name == "bcrypt":
+        return f"bcrypt:{int(args or 12)}"
+    return method
+
+
+def hash_password(password, method=DEFAULT_METHOD):
+    """Laske salasanatiiviste valitulla menetelmällä (ajetaan työprosessissa)."""
+    if method.startswith("bcrypt"):
+        if bcrypt is None:
+            raise RuntimeError("bcrypt is not installed")
+        rounds = int(method.partition(":")[2] or 12)
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("ascii")
+    return generate_password_hash(password, method=method)
+
+
+def check_password(password_hash, password):
+    """Tarkista salasana minkä tahansa tuetun menetelmän tiivistettä vasten."""
+    if password_hash.startswith("$2"):
+        if bcrypt is None:
+            raise RuntimeError("bcrypt is not installed")
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("ascii"))
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Salasanojen tiivistys ja tarkistus rajatussa prosessipoolissa.
+
+    Tiivistys on tarkoituksella raskasta, joten se ajetaan `workers`
+    prosessissa eikä pyyntösäikeissä. Jos kesken on jo `max_pending`
+    tehtävää, uusi pyyntö saa heti HasherBusy-poikkeuksen sen sijaan että
+    jono kasvaisi rajatta. workers=0 laskee samassa säikeessä.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_pending=64, timeout=10.0):
+        self.method = method
+        # Short forms ("scrypt", "pbkdf2", "bcrypt") expand to their full
+        # parameters in the stored hash; compare stored hashes against that
+        self.stored_method = expand_method(method)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pid = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {"hashes": 0, "checks": 0, "rejected": 0, "rehashes": 0}
+
+    def hash(self, password):
+        """Uusi tiiviste asetetulla menetelmällä."""
+        self._count("hashes")
+        return self._call(hash_password, password, self.method)
+
+    def check(self, password_hash, password):
+        """Vastaako salasana tiivistettä."""
+        self._count("checks")
+        return self._call(check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Onko tiiviste tehty muulla kuin nykyisellä menetelmällä tai kustannuksella."""
+        return hash_method(password_hash) != self.stored_method
+
+    def rehashed(self):
+        self._count("rehashes")
+
+    def close(self):
+        """Sammuta prosessipooli (luodaan uudelleen tarvittaessa)."""
+        with self._lock:
+            if self._executor is not None and self.pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+            self.pid = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        stats["workers"] = self.workers
+        stats["max_pending"] = self.max_pending
+        stats["method"] = self.method
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _call(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise HasherBusy()
+            self._pending += 1
+        try:
+            if not self.workers:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _get_executor(self):
+        # The pool's processes and management thread belong to the process
+        # that created it, so a forked worker needs its own
+        start_once(self, self._create_executor)
+        return self._executor
+
+    def _create_executor(self):
+        # forkserver: the pool is created from a request thread of a process
+        # that already runs other threads, and forking such a process can
+        # leave a lock held forever in the child
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+        )
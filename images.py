@@ -0,0 +1,218 @@
+import hashlib
+import io
+from collections import namedtuple
+import db
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it images are served as uploaded
+    Image = None
+
+DEFAULT_IMAGE_PATH = db.DEFAULT_IMAGE_PATH
+
+# Rendered sizes (bounding boxes, 2x the CSS size): list card and detail page
+VARIANTS = {"thumb": (480, 300), "detail": (600, 600)}
+
+# Larger uploads are refused from the header, before any pixels are decoded
+MAX_PIXELS = 16_000_000
+MAX_SIDE = 6000
+
+# Output formats: WebP where the browser accepts it, JPEG otherwise
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Versioned image URLs never change content, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_default_image = None
+_default_variants = {}
+
+PreparedImage = namedtuple("PreparedImage", ["digest", "data", "variants"])
+
+
+class InvalidImage(ValueError):
+    """Ladattu tiedosto ei ole kelvollinen kuva."""
+
+
+def image_hash(data):
+    """Kuvan sisältöosoite: SHA-256 heksana."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def url_version(digest):
+    """Lyhyt versiotunniste kuvan URL:iin (?v=...)."""
+    return digest[:16]
+
+
+def sniff_mime(data):
+    """Päättele kuvan MIME-tyyppi tiedoston alusta (magic bytes)."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def default_image():
+    """Oletuskuvan tavut ja tiiviste, luetaan levyltä kerran prosessia kohden."""
+    global _default_image
+    if _default_image is None:
+        with open(DEFAULT_IMAGE_PATH, "rb") as f:
+            data = f.read()
+        _default_image = (data, image_hash(data))
+    return _default_image
+
+
+def variant_etag(digest, size, fmt):
+    """ETag yhdelle esitysmuodolle; alkuperäisellä kuvalla (myös ilman Pillowia) pelkkä tiiviste.
+
+    Sama arvo kuin load_image() palauttaa, joten 304-vastaus voidaan antaa
+    lukematta kuvaa.
+    """
+    return digest if size is None or Image is None else f"{digest}-{size}-{fmt}"
+
+
+def render_variants(data):
+    """Pura kuva kerran ja koodaa jokainen koko jokaisessa formaatissa.
+
+    Palauttaa {(koko, formaatti): (mime, tavut)}. Metatiedot (EXIF ym.) jäävät
+    pois, koska kuvat koodataan uudelleen ilman niitä. Ilman Pillowia {}.
+    """
+    if Image is None:
+        return {}
+    # Largest box first; EXIF rotation may swap the sides, so draft a square
+    sizes = sorted(VARIANTS, key=lambda size: VARIANTS[size][0] * VARIANTS[size][1], reverse=True)
+    side = max(max(box) for box in VARIANTS.values())
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            width, height = source.size
+            if width > MAX_SIDE or height > MAX_SIDE or width * height > MAX_PIXELS:
+                raise InvalidImage(f"image is too large ({width}x{height})")
+            # JPEG only: decode at 1/2, 1/4 or 1/8 scale while that still covers the box
+            source.draft("RGB", (side, side))
+            source.load()
+            image = ImageOps.exif_transpose(source)
+    except InvalidImage:
+        raise
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e)) from e
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    # Downscale the full image once; smaller sizes start from that result
+    largest = sizes[0]
+    image.thumbnail(VARIANTS[largest], Image.LANCZOS)
+    rendered = {}
+    for size in sizes:
+        scaled = image
+        if size != largest:
+            scaled = image.copy()
+            scaled.thumbnail(VARIANTS[size], Image.LANCZOS)
+        for fmt, (pil_format, mime, options) in FORMATS.items():
+            frame = scaled
+            if pil_format == "JPEG" and frame.mode != "RGB":
+                # JPEG has no alpha channel: flatten onto white
+                background = Image.new("RGB", frame.size, (255, 255, 255))
+                background.paste(frame, mask=frame.getchannel("A"))
+                frame = background
+            out = io.BytesIO()
+            frame.save(out, pil_format, **options)
+            rendered[(size, fmt)] = (mime, out.getvalue())
+    return rendered
+
+
+def _store_variants(digest, rendered):
+    db.execute_many(
+        "INSERT OR REPLACE INTO image_variants (hash, size, format, mime, data) VALUES (?, ?, ?, ?, ?)",
+        [(digest, size, fmt, mime, data) for (size, fmt), (mime, data) in rendered.items()],
+    )
+
+
+def prepare_image(data):
+    """Laske tiiviste ja renderöi pienennökset ennen tietokantatransaktiota.
+
+    Raskas kuvankäsittely tehdään näin kirjoituslukon ulkopuolella. Jos sama
+    kuva on jo tallennettu pienennöksineen, renderöinti ohitetaan.
+    Heittää InvalidImage, jos Pillow on käytössä eikä tiedosto ole kuva.
+    """
+    digest = image_hash(data)
+    if db.query("SELECT 1 FROM image_variants WHERE hash = ? LIMIT 1", [digest]):
+        return PreparedImage(digest, data, None)
+    return PreparedImage(digest, data, render_variants(data))
+
+
+def store_image(prepared):
+    """Tallenna prepare_image():n tulos (sama sisältö vain kerran). Palauttaa tiivisteen."""
+    with db.transaction():
+        db.execute(
+            "INSERT OR IGNORE INTO images (hash, mime, data) VALUES (?, ?, ?)",
+            [prepared.digest, sniff_mime(prepared.data), prepared.data],
+        )
+        if prepared.variants:
+            _store_variants(prepared.digest, prepared.variants)
+    return prepared.digest
+
+
+def load_image(digest, size, fmt="jpeg"):
+    """Hae kuvan esitysmuoto (mime, data, etag), tai None.
+
+    Alkuperäistä latausta ei palauteta, koska siinä voi olla metatietoja
+    (EXIF, GPS); se säilytetään vain pienennösten renderöintiä varten.
+    Puuttuvat pienennökset renderöidään ja tallennetaan ensimmäisellä
+    haulla. Ilman Pillowia kuvat palautetaan sellaisinaan.
+    """
+    if Image is not None:
+        rows = db.query(
+            "SELECT mime, data FROM image_variants WHERE hash = ? AND size = ? AND format = ?",
+            [digest, size, fmt],
+        )
+        if rows:
+            return rows[0]["mime"], rows[0]["data"], variant_etag(digest, size, fmt)
+    rows = db.query("SELECT mime, data FROM images WHERE hash = ?", [digest])
+    if not rows:
+        return None
+    if Image is None:
+        return rows[0]["mime"], rows[0]["data"], variant_etag(digest, size, fmt)
+    try:
+        rendered = render_variants(rows[0]["data"])
+    except InvalidImage:
+        return None
+    _store_variants(digest, rendered)
+    mime, data = rendered[(size, fmt)]
+    return mime, data, variant_etag(digest, size, fmt)
+
+
+def default_variant(size=None, fmt="jpeg"):
+    """Oletuskuvan esitysmuoto (mime, data, etag), renderöidään kerran prosessia kohden."""
+    data, digest = default_image()
+    if size is None or Image is None:
+        return sniff_mime(data), data, variant_etag(digest, size, fmt)
+    if not _default_variants:
+        _default_variants.update(render_variants(data))
+    mime, rendered = _default_variants[(size, fmt)]
+    return mime, rendered, variant_etag(digest, size, fmt)
+
+
+def rebuild_variants():
+    """Luo puuttuvat pienennökset aiemmin tallennetuille kuville. Palauttaa (luodut, ohitetut)."""
+    if Image is None:
+        return 0, 0
+    missing = db.query(
+        "SELECT hash FROM images WHERE hash NOT IN (SELECT hash FROM image_variants)"
+    )
+    created = skipped = 0
+    for row in missing:
+        original = db.query("SELECT data FROM images WHERE hash = ?", [row["hash"]])[0]["data"]
+        try:
+            _store_variants(row["hash"], render_variants(original))
+            created += 1
+        except InvalidImage:
+            skipped += 1
+    return created, skipped
@@ -1,28 +1,39 @@
-import sqlite3
-from werkzeug.security import generate_password_hash
+"""Create database.db from the production schema and fill it with test data.
+
+Usage: python init.db.py [--users 250] [--initiatives 150]
+                         [--distribution uniform|zipf] [--signatures N]
+                         [--seed 42] [--db database.db]
+
+The defaults give a small demo database. For load testing, e.g.
+    python init.db.py --users 1000000 --initiatives 20000 \\
+        --distribution zipf --signatures 5000000
+"""
+import argparse
+import datetime
+import itertools
 import os
 import random
-import datetime
+import time
+from functools import lru_cache
+import db
+from hashing import hash_password
 
 # Path to project root
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_FILE = os.path.join(BASE_DIR, "database.db")
-DEFAULT_IMAGE_PATH = os.path.join(BASE_DIR, "static", "kukka_optimized_50.png")
 
-# Load default image
-def load_default_image():
-    with open(DEFAULT_IMAGE_PATH, "rb") as f:
-        return f.read()
+# Same text format as CURRENT_TIMESTAMP, so generated and real rows sort together
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Random description generator
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    "Praesent vehicula, justo nec facilisis imperdiet, nulla massa malesuada sapien, "
+    "nec varius lorem ipsum non risus. "
+) * 20
+
 def random_description(min_len=50, max_len=500):
-    text = (
-        "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
-        "Praesent vehicula, justo nec facilisis imperdiet, nulla massa malesuada sapien, "
-        "nec varius lorem ipsum non risus. "
-    ) * 20
-    length = random.randint(min_len, max_len)
-    return text[:length]
+    return LOREM[:random.randint(min_len, max_len)]
 
 # Some random first/last names for demo users
 FIRST_NAMES = [
@@ -37,154 +48,184 @@ LAST_NAMES = [
 def random_name():
     return random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
 
-def init_db():
-    con = sqlite3.connect(DB_FILE)
-    cur = con.cursor()
-
-    # Create tables
-    cur.executescript("""
-    DROP TABLE IF EXISTS signatures;
-    DROP TABLE IF EXISTS initiatives;
-    DROP TABLE IF EXISTS users;
-
-    CREATE TABLE users (
-        id INTEGER PRIMARY KEY,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        first_name TEXT,
-        last_name TEXT,
-        created_at TEXT DEFAULT (datetime('now')),
-        is_admin INTEGER DEFAULT 0
-    );
-
-    CREATE TABLE initiatives (
-        id INTEGER PRIMARY KEY,
-        title TEXT NOT NULL,
-        description TEXT NOT NULL,
-        creator_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-        created_at TEXT DEFAULT (datetime('now')),
-        start_date TEXT,
-        end_date TEXT,
-        active INTEGER DEFAULT 1,
-        user_id INTEGER,
-        image BLOB,
-        deleted INTEGER DEFAULT 0
-    );
-
-    CREATE TABLE signatures (
-        id INTEGER PRIMARY KEY,
-        initiative_id INTEGER NOT NULL REFERENCES initiatives(id) ON DELETE CASCADE,
-        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-        signed_at TEXT DEFAULT (datetime('now'))
-    );
-    """)
-
-    # Default users with custom names
-    users = [
-        ("admin", generate_password_hash("admin123"), "Allu", "Administrator", 1),
-        ("matti", generate_password_hash("matti123"), "Matti", "Sörsselssön", 0),
-        ("liisa", generate_password_hash("liisa123"), "Liisa", "Liitovaara", 0),
-    ]
-
-    # Generate 247 more random users
-    for i in range(4, 251):
-        username = f"user{i}"
-        password = generate_password_hash("password123")
-        first, last = random_name()
-        users.append((username, password, first, last, 0))
+# Default users with custom names; every other user gets "password123"
+FIXED_USERS = [
+    ("admin", "admin123", "Allu", "Administrator", 1),
+    ("matti", "matti123", "Matti", "Sörsselssön", 0),
+    ("liisa", "liisa123", "Liisa", "Liitovaara", 0),
+]
 
-    cur.executemany(
-        "INSERT INTO users (username, password_hash, first_name, last_name, is_admin) VALUES (?, ?, ?, ?, ?)",
-        users
-    )
+@lru_cache(maxsize=None)
+def password_hash(password):
+    # Hashing is deliberately slow: every distinct password is hashed once
+    return hash_password(password)
 
-    default_img = load_default_image()
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
 
-    # Generate initiatives
-    initiatives = []
-    today = datetime.date.today()
-    created_at = today - datetime.timedelta(days=7)  # one week before script execution
+def random_timestamp(start, end):
+    return (start + (end - start) * random.random()).strftime(TIMESTAMP_FORMAT)
+
+def generate_users(count):
+    for username, password, first, last, is_admin in FIXED_USERS:
+        yield username, password_hash(password), first, last, is_admin
+    for i in range(len(FIXED_USERS) + 1, count + 1):
+        first, last = random_name()
+        yield f"user{i}", password_hash("password123"), first, last, 0
+
+def signature_counts(initiatives, users, distribution, total, max_per_initiative):
+    """Number of signers for each initiative, in initiative id order."""
+    if distribution == "uniform":
+        return [random.randint(0, min(max_per_initiative, users)) for _ in range(initiatives)]
+
+    # Zipf-like: the initiative of popularity rank r gets a share 1/r^s of all
+    # signatures (a few hot initiatives, a long tail). Ranks are shuffled so
+    # the hot ones are spread over the id and date range.
+    s = 1.1
+    weights = [1 / rank ** s for rank in range(1, initiatives + 1)]
+    scale = total / sum(weights)
+    counts = [min(users, round(w * scale)) for w in weights]
+    random.shuffle(counts)
+    return counts
+
+def generate_initiatives(count, users, days, counts, now):
+    today = now.date()
+    first = now - datetime.timedelta(days=days)
 
     # Force admin, matti and liisa to have 2–7 initiatives each
-    fixed_creators = {1: "Admin", 2: "Matti", 3: "Liisa"}
-    total_fixed = 0
-    for creator_id in fixed_creators.keys():
-        count = random.randint(2, 7)
-        total_fixed += count
-        for i in range(count):
-            start_date = created_at.isoformat()
-            end_date = (today + datetime.timedelta(days=random.randint(-3, 7))).isoformat()
-            active = 1 if datetime.date.fromisoformat(end_date) >= today else 0
-            initiatives.append((
-                f"{fixed_creators[creator_id]} Initiative {i+1}",
-                random_description(),
-                creator_id,
-                created_at.isoformat(),
-                start_date,
-                end_date,
-                active,
-                None,
-                default_img,
-                0
-            ))
-
-    # Remaining initiatives up to 150 total
-    for i in range(total_fixed + 1, 151):
-        creator_id = random.randint(1, 250)
-        start_date = created_at.isoformat()
-        end_date = (today + datetime.timedelta(days=random.randint(-3, 7))).isoformat()
-        active = 1 if datetime.date.fromisoformat(end_date) >= today else 0
-
-        initiatives.append((
-            f"Test Initiative {i}",
+    creators = []
+    for creator_id, (username, *_) in enumerate(FIXED_USERS[:min(users, 3)], start=1):
+        creators += [(creator_id, f"{username.capitalize()} Initiative {n}")
+                     for n in range(1, random.randint(2, 7) + 1)]
+    creators = creators[:count]
+    creators += [(random.randint(1, users), f"Test Initiative {i}")
+                 for i in range(len(creators) + 1, count + 1)]
+
+    for (creator_id, title), signatures in zip(creators, counts):
+        created_at = first + (now - first) * random.random()
+        end_date = today + datetime.timedelta(days=random.randint(-3, 7))
+        active = 1 if end_date >= today else 0
+        yield (
+            title,
             random_description(),
             creator_id,
-            created_at.isoformat(),
-            start_date,
-            end_date,
+            created_at.strftime(TIMESTAMP_FORMAT),
+            created_at.date().isoformat(),
+            end_date.isoformat(),
             active,
-            None,
-            default_img,
-            0
-        ))
-
-    cur.executemany(
+            0,
+            signatures,
+        )
+
+def generate_signatures(counts, users, created, now):
+    for initiative_id, (signers, created_at) in enumerate(zip(counts, created), start=1):
+        # sample() of a range draws without building the whole population
+        for user_id in random.sample(range(1, users + 1), signers):
+            yield initiative_id, user_id, random_timestamp(created_at, now)
+
+def init_db(path, users, initiatives, distribution, signatures, max_per_initiative,
+            days, chunk_size):
+    # Build the production schema (schema.sql + migrations) from scratch
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+    db.migrate(path)
+
+    con = db.connect(path)
+    # Bulk load settings: a throwaway file needs no journal or fsync, and
+    # generated ids are consistent, so foreign keys need not be checked
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("PRAGMA foreign_keys = OFF")
+    con.execute("PRAGMA cache_size = -262144")
+    con.execute("PRAGMA temp_store = MEMORY")
+
+    # Signature triggers, the admin total triggers and secondary indexes are
+    # set aside during the load: signature_count is written directly, rollups
+    # and totals are computed in one pass and indexes are built once at the
+    # end, from the definitions migrate() created
+    deferred = con.execute(
         """
-        INSERT INTO initiatives
-        (title, description, creator_id, created_at, start_date, end_date, active, user_id, image, deleted)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        initiatives
-    )
-
-    # Generate signatures (0–60 per initiative)
-    signatures = []
-    for initiative_id in range(1, len(initiatives) + 1):
-        signer_count = random.randint(0, 60)
-        signers = random.sample(range(1, 251), signer_count)
-        for user_id in signers:
-            signed_at = today.isoformat()
-            signatures.append((initiative_id, user_id, signed_at))
-
-    cur.executemany(
-        "INSERT INTO signatures (initiative_id, user_id, signed_at) VALUES (?, ?, ?)",
-        signatures
-    )
-
-    con.commit()
+        SELECT type, name, sql FROM sqlite_master
+        WHERE (tbl_name = 'signatures' AND type IN ('trigger', 'index') AND sql IS NOT NULL)
+           OR (type = 'trigger' AND name GLOB '*_totals_*')
+        """
+    ).fetchall()
+    for row in deferred:
+        con.execute(f"DROP {row['type']} {row['name']}")
+
+    # UTC, like the datetime('now') defaults of the schema
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+    counts = signature_counts(initiatives, users, distribution, signatures, max_per_initiative)
+
+    con.execute("BEGIN")
+    for chunk in chunked(generate_users(users), chunk_size):
+        con.executemany(
+            "INSERT INTO users (username, password_hash, first_name, last_name, is_admin) VALUES (?, ?, ?, ?, ?)",
+            chunk,
+        )
+
+    created = []
+    for chunk in chunked(generate_initiatives(initiatives, users, days, counts, now), chunk_size):
+        con.executemany(
+            """
+            INSERT INTO initiatives
+            (title, description, creator_id, created_at, start_date, end_date, active, deleted,
+             signature_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            chunk,
+        )
+        created += [datetime.datetime.strptime(row[3], TIMESTAMP_FORMAT) for row in chunk]
+
+    for chunk in chunked(generate_signatures(counts, users, created, now), chunk_size):
+        con.executemany(
+            "INSERT INTO signatures (initiative_id, user_id, signed_at) VALUES (?, ?, ?)",
+            chunk,
+        )
+
+    db.backfill_signature_rollups(con)
+    db.backfill_totals(con)
+    for row in deferred:
+        con.execute(row["sql"])
+    con.execute("COMMIT")
+
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("ANALYZE")
+    con.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_FILE, help="database file (replaced)")
+    parser.add_argument("--users", type=int, default=250)
+    parser.add_argument("--initiatives", type=int, default=150)
+    parser.add_argument("--distribution", choices=["uniform", "zipf"], default="uniform",
+                        help="uniform: 0..--max-per-initiative signers each; "
+                             "zipf: --signatures in total, a few hot initiatives")
+    parser.add_argument("--signatures", type=int, default=10000,
+                        help="total signatures for the zipf distribution")
+    parser.add_argument("--max-per-initiative", type=int, default=60)
+    parser.add_argument("--days", type=int, default=7,
+                        help="initiatives are created during the last DAYS days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+
+    random.seed(args.seed)
+    started = time.perf_counter()
+    counts = init_db(args.db, args.users, args.initiatives, args.distribution, args.signatures,
+                     args.max_per_initiative, args.days, args.chunk_size)
 
     # Print summary
-    print(f"Database created at {DB_FILE}")
-    print(f"Users: {len(users)}")
-    print(f"Initiatives: {len(initiatives)}")
-    print(f"Signatures: {len(signatures)}")
-
-    print("\nFixed creators sample initiatives:")
-    for c in fixed_creators.keys():
-        rows = [i for i in initiatives if i[2] == c]
-        print(f" - User {c} has {len(rows)} initiatives")
-
-    con.close()
+    print(f"Database created at {args.db} in {time.perf_counter() - started:.1f} s")
+    print(f"Users: {args.users}")
+    print(f"Initiatives: {args.initiatives}")
+    print(f"Signatures: {sum(counts)} (most on one initiative: {max(counts, default=0)})")
 
 if __name__ == "__main__":
-    init_db()
+    main()
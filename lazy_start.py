@@ -0,0 +1,24 @@
+import os
+import threading
+
+
+def start_once(obj, start):
+    """Kutsu start() kerran prosessia kohden.
+
+    Taustasäikeet ja -prosessit käynnistetään laiskasti ensimmäisellä
+    käytöllä, ja uudelleen forkatussa workerissa, koska säikeet eivät
+    periydy forkissa. `obj`:lla on oltava attribuutit pid ja _lock;
+    close() voi nollata pid:n, jolloin start() kutsutaan taas.
+    """
+    if obj.pid != os.getpid():
+        with obj._lock:
+            if obj.pid != os.getpid():
+                start()
+                obj.pid = os.getpid()
+
+
+def start_thread(target, name):
+    """Käynnistä daemon-säie."""
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
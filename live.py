@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import Counter
+import db
+from lazy_start import start_once, start_thread
+
+
+class LiveBusy(Exception):
+    """Prosessissa on jo enimmäismäärä avoimia virtoja; tilaus hylätään."""
+
+
+class Subscription:
+    """Yhden katsojan tilaus: odottavat määrät, uusin arvo voittaa."""
+
+    def __init__(self, ids):
+        self.ids = frozenset(ids)
+        self._updates = {}
+        self._cond = threading.Condition()
+
+    def push(self, counts):
+        with self._cond:
+            self._updates.update(counts)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Odota päivityksiä enintään `timeout` sekuntia. Palauttaa {id: määrä} (voi olla tyhjä)."""
+        with self._cond:
+            if not self._updates:
+                self._cond.wait(timeout)
+            updates, self._updates = self._updates, {}
+        return updates
+
+
+class CountNotifier:
+    """Allekirjoitusmäärien muutokset kaikille tilaajille yhdestä lähteestä.
+
+    Kirjoituspolku merkitsee aloitteen muuttuneeksi (publish). Yksi säie
+    lukee muuttuneiden, jonkun seuraamien aloitteiden määrät yhdellä
+    kyselyllä enintään `max_rate` kertaa sekunnissa ja jakaa ne tilaajille,
+    joten tietokantakuorma ei riipu katsojien määrästä. Muiden prosessien
+    kirjoitukset huomataan PRAGMA data_version -kyselyllä `poll_interval`
+    sekunnin välein.
+
+    Jokainen tilaus pitää palvelimen säiettä varattuna, joten prosessissa
+    voi olla enintään `max_streams` tilausta; seuraava saa heti
+    LiveBusy-poikkeuksen, ja muille pyynnöille jää säikeitä.
+    """
+
+    def __init__(self, db_file=None, max_rate=2.0, poll_interval=2.0, max_streams=None):
+        self.db_file = db_file
+        self.max_rate = max_rate
+        self.poll_interval = poll_interval
+        self.max_streams = max_streams
+        self.pid = None
+        self._lock = threading.Lock()
+        self._stop = None
+        self._subscriptions = set()
+        self._watched = Counter()
+        self._dirty = set()
+        self._last = {}
+        self._stats = {"ticks": 0, "queries": 0, "events": 0, "polls": 0, "rejected": 0}
+
+    def publish(self, initiative_id):
+        """Aloitteen määrä muuttui (kutsutaan vahvistetun kirjoituksen jälkeen)."""
+        with self._lock:
+            if initiative_id in self._watched:
+                self._dirty.add(initiative_id)
+
+    def subscribe(self, ids):
+        self._ensure_started()
+        subscription = Subscription(ids)
+        with self._lock:
+            if self.max_streams is not None and len(self._subscriptions) >= self.max_streams:
+                self._stats["rejected"] += 1
+                raise LiveBusy()
+            self._subscriptions.add(subscription)
+            self._watched.update(subscription.ids)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            self._watched.subtract(subscription.ids)
+            for initiative_id in subscription.ids:
+                if self._watched[initiative_id] <= 0:
+                    del self._watched[initiative_id]
+                    self._last.pop(initiative_id, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["subscribers"] = len(self._subscriptions)
+            stats["watched"] = len(self._watched)
+        stats["max_streams"] = self.max_streams
+        return stats
+
+    def close(self):
+        """Pysäytä säie (seuraava tilaus käynnistää uuden)."""
+        with self._lock:
+            if self._stop is not None and self.pid == os.getpid():
+                self._stop.set()
+            self.pid = None
+
+    def _ensure_started(self):
+        start_once(self, self._start)
+
+    def _start(self):
+        # Subscriptions inherited from the parent have no stream in this process
+        self._subscriptions = set()
+        self._watched = Counter()
+        self._dirty = set()
+        self._last = {}
+        stop = self._stop = threading.Event()
+        start_thread(lambda: self._run(stop), "count-notifier")
+
+    def _run(self, stop):
+        con = db.connect(self.db_file or db.DB_FILE)
+        data_version = None
+        next_poll = 0.0
+        try:
+            while not stop.wait(1 / self.max_rate):
+                with self._lock:
+                    dirty, self._dirty = self._dirty, set()
+                    watched = set(self._watched)
+                    self._stats["ticks"] += 1
+                if not watched:
+                    continue
+
+                # Commits from any other connection (other workers, the writer
+                # thread) change data_version: recheck everything watched
+                now = time.monotonic()
+                if now >= next_poll:
+                    next_poll = now + self.poll_interval
+                    current = con.execute("PRAGMA data_version").fetchone()[0]
+                    if current != data_version:
+                        data_version = current
+                        dirty = watched
+                        self._count("polls")
+
+                dirty &= watched
+                if not dirty:
+                    continue
+                try:
+                    counts = self._read_counts(con, sorted(dirty))
+                except Exception:  # keep the notifier alive; retry on the next tick
+                    with self._lock:
+                        self._dirty |= dirty
+                    continue
+                self._fan_out(counts)
+        finally:
+            con.close()
+
+    def _read_counts(self, con, ids):
+        counts = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = con.execute(
+                f"SELECT id, signature_count FROM initiatives WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            counts.update((row["id"], row["signature_count"]) for row in rows)
+            self._count("queries")
+        return counts
+
+    def _fan_out(self, counts):
+        with self._lock:
+            changed = {i: n for i, n in counts.items() if self._last.get(i) != n and i in self._watched}
+            self._last.update(changed)
+            subscriptions = list(self._subscriptions)
+        if not changed:
+            return
+        for subscription in subscriptions:
+            mine = {i: n for i, n in changed.items() if i in subscription.ids}
+            if mine:
+                subscription.push(mine)
+                self._count("events")
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
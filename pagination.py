@@ -0,0 +1,80 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+import db
+
+PER_PAGE = 30
+
+Page = namedtuple("Page", ["rows", "next_cursor", "prev_cursor"])
+
+
+def encode_cursor(values, direction):
+    """Avainsarakkeiden arvot ja suunta URL-turvalliseksi kursoriksi."""
+    raw = json.dumps([direction, list(values)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, key_count):
+    """Pura kursori. Virheellinen tai väärän muotoinen kursori tulkitaan ensimmäiseksi sivuksi."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev") or not isinstance(values, list) or len(values) != key_count:
+        return None
+    return direction, values
+
+
+def page_query(sql, keys, values=None, smaller=True, per_page=PER_PAGE):
+    """Kääri `sql` keyset-ehdolla ja -järjestyksellä. Palauttaa (sql, lisäparametrit)."""
+    columns = ", ".join(keys)
+    order = "DESC" if smaller else "ASC"
+    where = ""
+    params = []
+    if values is not None:
+        placeholders = ", ".join("?" for _ in keys)
+        where = f"WHERE ({columns}) {'<' if smaller else '>'} ({placeholders})"
+        params += values
+    page_sql = (
+        f"SELECT * FROM ({sql}) {where} "
+        f"ORDER BY {', '.join(f'{key} {order}' for key in keys)} LIMIT ?"
+    )
+    return page_sql, params + [per_page + 1]
+
+
+def paginate(sql, params, keys, cursor=None, per_page=PER_PAGE, descending=True):
+    """Keyset-sivutus: hae yksi sivu kyselystä `sql` avainsarakkeiden `keys` järjestyksessä.
+
+    `sql` on SELECT ilman ORDER BY:tä ja sen tulossarakkeisiin kuuluvat `keys`
+    (viimeisen avaimen on oltava yksikäsitteinen, esim. id). Työn määrä
+    riippuu sivun koosta, ei taulun koosta, kun avaimille on indeksi.
+    """
+    params = list(params or [])
+    decoded = decode_cursor(cursor, len(keys))
+    direction, values = decoded if decoded else ("next", None)
+    forward = direction == "next"
+
+    # Walking forward in a descending list means smaller keys, and vice versa
+    page_sql, page_params = page_query(sql, keys, values, forward == descending, per_page)
+    rows = db.query(page_sql, params + page_params)
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if not forward:
+        if not more:
+            # Walked back to the start: serve a full first page instead
+            return paginate(sql, params, keys, None, per_page, descending)
+        rows.reverse()
+
+    has_next = more if forward else True
+    has_prev = values is not None if forward else True
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor([rows[-1][key] for key in keys], "next")
+    if rows and has_prev:
+        prev_cursor = encode_cursor([rows[0][key] for key in keys], "prev")
+    return Page(rows, next_cursor, prev_cursor)
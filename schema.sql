@@ -1,33 +1,268 @@
+-- Current schema for a fresh database. Existing databases are brought up
+-- to date by the numbered migrations in db.py (PRAGMA user_version).
+-- Every statement is idempotent so concurrent workers can apply it safely.
 PRAGMA foreign_keys = ON;
 
-DROP TABLE IF EXISTS votes;
-    DROP TABLE IF EXISTS signatures;
-    DROP TABLE IF EXISTS initiatives;
-    DROP TABLE IF EXISTS users;
-
-    CREATE TABLE users (
+    CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY,
         username TEXT UNIQUE NOT NULL,
         password_hash TEXT NOT NULL,
+        first_name TEXT,
+        last_name TEXT,
         created_at TEXT DEFAULT (datetime('now')),
         is_admin INTEGER DEFAULT 0
     );
 
-    CREATE TABLE initiatives (
+    -- Content-addressed image store; initiatives reference images by hash and
+    -- a NULL image_hash means the shared default image
+    CREATE TABLE IF NOT EXISTS images (
+        hash TEXT PRIMARY KEY,
+        mime TEXT NOT NULL DEFAULT 'application/octet-stream',
+        data BLOB NOT NULL
+    );
+
+    -- Re-encoded, metadata-free renditions of each image: size x format
+    CREATE TABLE IF NOT EXISTS image_variants (
+        hash TEXT NOT NULL REFERENCES images(hash) ON DELETE CASCADE,
+        size TEXT NOT NULL,
+        format TEXT NOT NULL,
+        mime TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (hash, size, format)
+    );
+
+    CREATE TABLE IF NOT EXISTS initiatives (
         id INTEGER PRIMARY KEY,
         title TEXT NOT NULL,
         description TEXT NOT NULL,
         creator_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
         created_at TEXT DEFAULT (datetime('now')),
+        start_date TEXT,
+        end_date TEXT,
         active INTEGER DEFAULT 1,
         user_id INTEGER,
-        image BLOB,
-        deleted INTEGER DEFAULT 0
+        image_hash TEXT REFERENCES images(hash),
+        deleted INTEGER DEFAULT 0,
+        signature_count INTEGER NOT NULL DEFAULT 0,
+        -- Bumped by triggers on every change to the row (ETags of the JSON API)
+        version INTEGER NOT NULL DEFAULT 0
     );
 
-    CREATE TABLE signatures (
+    CREATE TABLE IF NOT EXISTS signatures (
         id INTEGER PRIMARY KEY,
         initiative_id INTEGER NOT NULL REFERENCES initiatives(id) ON DELETE CASCADE,
         user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
         signed_at TEXT DEFAULT (datetime('now'))
-    );
\ No newline at end of file
+    );
+
+    -- One signature per user and initiative; also serves the "has signed" check
+    CREATE UNIQUE INDEX IF NOT EXISTS signatures_user_initiative
+        ON signatures(user_id, initiative_id);
+
+    -- Signature lists of an initiative, newest first (covering)
+    CREATE INDEX IF NOT EXISTS signatures_initiative_signed
+        ON signatures(initiative_id, signed_at, user_id);
+
+    -- Front page lists: WHERE active=? AND deleted=? ORDER BY created_at
+    CREATE INDEX IF NOT EXISTS initiatives_listing
+        ON initiatives(active, deleted, created_at);
+
+    -- User page (newest first) and user deletion
+    CREATE INDEX IF NOT EXISTS initiatives_creator_created
+        ON initiatives(creator_id, deleted, created_at);
+
+    -- Admin listing of all initiatives, newest first
+    CREATE INDEX IF NOT EXISTS initiatives_created
+        ON initiatives(created_at);
+
+    -- Open initiatives by end date: the deadline sweeper closes expired ones
+    -- without scanning the table (see deadlines.py)
+    CREATE INDEX IF NOT EXISTS initiatives_deadline
+        ON initiatives(active, end_date);
+
+    -- Admin filter and count on the admin dashboard (a handful of rows)
+    CREATE INDEX IF NOT EXISTS users_admins
+        ON users(is_admin) WHERE is_admin = 1;
+
+    -- Admin dashboard sorted by signatures: keyset pages walk the index
+    -- (backwards for the descending sort) instead of sorting the table
+    CREATE INDEX IF NOT EXISTS initiatives_signatures
+        ON initiatives(signature_count, id);
+
+    -- Reference lookups for releasing unused images
+    CREATE INDEX IF NOT EXISTS initiatives_image
+        ON initiatives(image_hash);
+
+    -- Keep initiatives.signature_count exact on every write path
+    -- (sign, unsign, purge, user delete and cascades)
+    CREATE TRIGGER IF NOT EXISTS signatures_count_insert AFTER INSERT ON signatures
+    BEGIN
+        UPDATE initiatives SET signature_count = signature_count + 1, version = version + 1
+        WHERE id = NEW.initiative_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS signatures_count_delete AFTER DELETE ON signatures
+    BEGIN
+        UPDATE initiatives SET signature_count = signature_count - 1, version = version + 1
+        WHERE id = OLD.initiative_id;
+    END;
+
+    -- Drop images no initiative references any more
+    CREATE TRIGGER IF NOT EXISTS images_release_update AFTER UPDATE OF image_hash ON initiatives
+    WHEN OLD.image_hash IS NOT NULL AND OLD.image_hash IS NOT NEW.image_hash
+    BEGIN
+        DELETE FROM images WHERE hash = OLD.image_hash
+          AND NOT EXISTS (SELECT 1 FROM initiatives WHERE image_hash = OLD.image_hash);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS images_release_delete AFTER DELETE ON initiatives
+    WHEN OLD.image_hash IS NOT NULL
+    BEGIN
+        DELETE FROM images WHERE hash = OLD.image_hash
+          AND NOT EXISTS (SELECT 1 FROM initiatives WHERE image_hash = OLD.image_hash);
+    END;
+
+    -- Global data version: bumped by every change that can alter a rendered
+    -- initiative list (signatures reach it through signature_count updates).
+    -- Caches key on it, see cache.py.
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0);
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_version_insert AFTER INSERT ON initiatives
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_version_update AFTER UPDATE ON initiatives
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_version_delete AFTER DELETE ON initiatives
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_version_username AFTER UPDATE OF username ON users
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+    END;
+
+    -- Role version: bumped when a user's admin flag changes or a user is
+    -- deleted, so every process can drop its cached roles (see cache.py).
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('roles_version', 0);
+
+    CREATE TRIGGER IF NOT EXISTS users_roles_update AFTER UPDATE OF is_admin ON users
+    WHEN OLD.is_admin IS NOT NEW.is_admin
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'roles_version';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_roles_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'roles_version';
+    END;
+
+    -- Admin dashboard totals (initiatives by state, signatures, users, admins),
+    -- kept current by triggers so the dashboard reads six rows, not the tables
+    INSERT OR IGNORE INTO meta (key, value) VALUES
+        ('total_open', 0), ('total_closed', 0), ('total_deleted', 0),
+        ('total_signatures', 0), ('total_users', 0), ('total_admins', 0);
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_totals_insert AFTER INSERT ON initiatives
+    BEGIN
+        UPDATE meta SET value = value + 1
+        WHERE key = CASE WHEN NEW.deleted THEN 'total_deleted' WHEN NEW.active THEN 'total_open' ELSE 'total_closed' END;
+        UPDATE meta SET value = value + NEW.signature_count WHERE key = 'total_signatures';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_totals_delete AFTER DELETE ON initiatives
+    BEGIN
+        UPDATE meta SET value = value - 1
+        WHERE key = CASE WHEN OLD.deleted THEN 'total_deleted' WHEN OLD.active THEN 'total_open' ELSE 'total_closed' END;
+        UPDATE meta SET value = value - OLD.signature_count WHERE key = 'total_signatures';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_totals_state AFTER UPDATE OF active, deleted ON initiatives
+    WHEN CASE WHEN OLD.deleted THEN 'total_deleted' WHEN OLD.active THEN 'total_open' ELSE 'total_closed' END
+         IS NOT CASE WHEN NEW.deleted THEN 'total_deleted' WHEN NEW.active THEN 'total_open' ELSE 'total_closed' END
+    BEGIN
+        UPDATE meta SET value = value - 1
+        WHERE key = CASE WHEN OLD.deleted THEN 'total_deleted' WHEN OLD.active THEN 'total_open' ELSE 'total_closed' END;
+        UPDATE meta SET value = value + 1
+        WHERE key = CASE WHEN NEW.deleted THEN 'total_deleted' WHEN NEW.active THEN 'total_open' ELSE 'total_closed' END;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS initiatives_totals_signatures AFTER UPDATE OF signature_count ON initiatives
+    WHEN OLD.signature_count IS NOT NEW.signature_count
+    BEGIN
+        UPDATE meta SET value = value + NEW.signature_count - OLD.signature_count
+        WHERE key = 'total_signatures';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_totals_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'total_users';
+        UPDATE meta SET value = value + (NEW.is_admin IS 1) WHERE key = 'total_admins';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_totals_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE meta SET value = value - 1 WHERE key = 'total_users';
+        UPDATE meta SET value = value - (OLD.is_admin IS 1) WHERE key = 'total_admins';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_totals_admin AFTER UPDATE OF is_admin ON users
+    WHEN OLD.is_admin IS NOT NEW.is_admin
+    BEGIN
+        UPDATE meta SET value = value + (NEW.is_admin IS 1) - (OLD.is_admin IS 1)
+        WHERE key = 'total_admins';
+    END;
+
+    -- Signatures per initiative per hour, kept current by triggers on sign and
+    -- unsign; summaries read these rows instead of scanning signatures
+    CREATE TABLE IF NOT EXISTS signature_rollups (
+        initiative_id INTEGER NOT NULL REFERENCES initiatives(id) ON DELETE CASCADE,
+        hour TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (initiative_id, hour)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS signature_rollups_hour
+        ON signature_rollups(hour, initiative_id, count);
+
+    CREATE TRIGGER IF NOT EXISTS signatures_rollup_insert AFTER INSERT ON signatures
+    WHEN strftime('%Y-%m-%d %H:00:00', NEW.signed_at) IS NOT NULL
+    BEGIN
+        INSERT INTO signature_rollups (initiative_id, hour, count)
+        VALUES (NEW.initiative_id, strftime('%Y-%m-%d %H:00:00', NEW.signed_at), 1)
+        ON CONFLICT (initiative_id, hour) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS signatures_rollup_delete AFTER DELETE ON signatures
+    WHEN strftime('%Y-%m-%d %H:00:00', OLD.signed_at) IS NOT NULL
+    BEGIN
+        UPDATE signature_rollups SET count = count - 1
+        WHERE initiative_id = OLD.initiative_id
+          AND hour = strftime('%Y-%m-%d %H:00:00', OLD.signed_at);
+        DELETE FROM signature_rollups
+        WHERE initiative_id = OLD.initiative_id
+          AND hour = strftime('%Y-%m-%d %H:00:00', OLD.signed_at)
+          AND count <= 0;
+    END;
+
+    -- Any other change to an initiative, or to its creator's username, bumps
+    -- the row version (the signature triggers above bump it themselves)
+    CREATE TRIGGER IF NOT EXISTS initiatives_row_version AFTER UPDATE ON initiatives
+    WHEN NEW.version = OLD.version
+    BEGIN
+        UPDATE initiatives SET version = version + 1 WHERE id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS users_initiatives_version AFTER UPDATE OF username ON users
+    BEGIN
+        UPDATE initiatives SET version = version + 1 WHERE creator_id = NEW.id;
+    END;
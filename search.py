@@ -0,0 +1,56 @@
+import re
+import db
+from pagination import Page, paginate
+
+# bm25 column weights: title, description, creator username
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+SEARCH_FTS_SQL = f"""
+    SELECT i.id, i.title, u.username, i.image_hash,
+           i.signature_count AS signatures,
+           bm25(initiatives_fts, {", ".join(str(w) for w in BM25_WEIGHTS)}) AS rank
+    FROM initiatives_fts
+    JOIN initiatives i ON i.id = initiatives_fts.rowid
+    JOIN users u ON i.creator_id = u.id
+    WHERE initiatives_fts MATCH ? AND i.deleted = 0
+"""
+# Best bm25 score first (lower is better), id breaks ties
+SEARCH_FTS_KEYS = ("rank", "id")
+
+SEARCH_LIKE_SQL = """
+    SELECT i.id, i.title, u.username, i.image_hash,
+           i.signature_count AS signatures, i.created_at
+    FROM initiatives i
+    JOIN users u ON i.creator_id = u.id
+    WHERE i.deleted = 0
+      AND (i.title LIKE ? OR i.description LIKE ? OR u.username LIKE ?)
+"""
+# Newest first
+SEARCH_LIKE_KEYS = ("created_at", "id")
+
+_fts_available = {}
+
+
+def match_expression(text):
+    """Muunna hakusana FTS5-lausekkeeksi: jokainen sana etuliitehakuna, kaikkien oltava mukana."""
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def fulltext_available():
+    """FTS5-indeksin olemassaolo tarkistetaan kerran tietokantaa kohden."""
+    if db.DB_FILE not in _fts_available:
+        _fts_available[db.DB_FILE] = db.has_fulltext_search()
+    return _fts_available[db.DB_FILE]
+
+
+def search_initiatives(text, cursor=None):
+    """Hae sivu poistamattomia aloitteita osuvuusjärjestyksessä (FTS5) tai LIKE-haulla."""
+    if fulltext_available():
+        expression = match_expression(text)
+        if not expression:
+            return Page([], None, None)
+        return paginate(SEARCH_FTS_SQL, [expression], SEARCH_FTS_KEYS, cursor, descending=False)
+
+    pattern = f"%{text}%"
+    return paginate(SEARCH_LIKE_SQL, [pattern, pattern, pattern], SEARCH_LIKE_KEYS, cursor)
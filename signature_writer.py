@@ -0,0 +1,153 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import db
+from lazy_start import start_once, start_thread
+
+SIGN = "sign"
+UNSIGN = "unsign"
+
+
+class WriterBusy(Exception):
+    """Allekirjoituksen erä ei valmistunut aikarajassa; pyyntö hylätään."""
+
+
+class SignatureWriter:
+    """Ryhmävahvistus (group commit) allekirjoituksille.
+
+    Pyynnöt jättävät allekirjoitukset jonoon ja odottavat. Yksi kirjoitussäie
+    kokoaa jonosta erän (enintään `max_batch` kpl tai `max_delay` sekuntia
+    ensimmäisestä) ja kirjoittaa sen yhdessä transaktiossa. Pyyntö kuitataan
+    vasta, kun sen erä on vahvistettu.
+    """
+
+    def __init__(self, db_file=None, max_batch=256, max_delay=0.001, timeout=10.0):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.pid = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "items": 0, "max_batch": 0, "errors": 0, "timeouts": 0}
+
+    def submit(self, op, user_id, initiative_id):
+        """Jonota allekirjoitus tai sen poisto. Palauttaa True, jos tila muuttui.
+
+        Heittää WriterBusy, jos erä ei valmistu `timeout` sekunnissa (jonossa
+        oleva muutos voi silti tallentua myöhemmin; uusi yritys on turvallinen),
+        ja sqlite3.IntegrityError, jos rivi rikkoo rajoitetta.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((op, user_id, initiative_id, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise WriterBusy() from None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def close(self):
+        """Pysäytä kirjoitussäie, kun jo jonossa olevat on kirjoitettu."""
+        with self._lock:
+            if self.pid == os.getpid():
+                self._queue.put(None)
+            self.pid = None
+
+    def _ensure_started(self):
+        start_once(self, self._start)
+
+    def _start(self):
+        # Items queued in the parent have no writer in this process
+        q = self._queue = queue.Queue()
+        start_thread(lambda: self._run(q), "signature-writer")
+
+    def _collect(self, q):
+        # None (from close()) ends the batch and the thread
+        batch = [q.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, q):
+        con = db.connect(self.db_file or db.DB_FILE)
+        try:
+            while True:
+                batch = self._collect(q)
+                stopping = batch[-1] is None
+                if stopping:
+                    batch.pop()
+                if batch:
+                    self._write(con, batch)
+                if stopping:
+                    return
+        finally:
+            con.close()
+
+    def _write(self, con, batch):
+        results = []
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            for op, user_id, initiative_id, future in batch:
+                try:
+                    results.append(self._apply(con, op, user_id, initiative_id))
+                except sqlite3.IntegrityError as e:
+                    results.append(e)
+            con.execute("COMMIT")
+        except Exception as e:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            with self._lock:
+                self._stats["errors"] += 1
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+        for (*_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _apply(con, op, user_id, initiative_id):
+        # A savepoint per item: one failing signature (e.g. a purged
+        # initiative) must not take the rest of the batch down with it
+        con.execute("SAVEPOINT item")
+        try:
+            if op == SIGN:
+                cur = con.execute(
+                    "INSERT OR IGNORE INTO signatures(user_id, initiative_id) VALUES (?, ?)",
+                    [user_id, initiative_id],
+                )
+            else:
+                cur = con.execute(
+                    "DELETE FROM signatures WHERE user_id=? AND initiative_id=?",
+                    [user_id, initiative_id],
+                )
+        except sqlite3.IntegrityError:
+            con.execute("ROLLBACK TO item")
+            con.execute("RELEASE item")
+            raise
+        con.execute("RELEASE item")
+        return cur.rowcount == 1
@@ -0,0 +1,62 @@
+// Progressive enhancement for the initiative page. Without JavaScript the
+// form posts as usual and the count is as of the page load.
+(() => {
+  const count = document.getElementById("signature-count");
+  const form = document.getElementById("signature-form");
+
+  // Live signature count (Server-Sent Events)
+  if (count && count.dataset.liveUrl && window.EventSource) {
+    let delay = 30000;
+    const connect = () => {
+      const live = new EventSource(count.dataset.liveUrl);
+      live.addEventListener("open", () => {
+        delay = 30000;
+      });
+      live.addEventListener("counts", (event) => {
+        for (const update of JSON.parse(event.data)) {
+          count.textContent = update.signatures;
+        }
+      });
+      // EventSource retries dropped connections itself, but gives up on an
+      // error status such as 503 (server busy): try again later, backing off
+      live.addEventListener("error", () => {
+        if (live.readyState === EventSource.CLOSED) {
+          setTimeout(connect, delay * (0.5 + Math.random()));
+          delay = Math.min(delay * 2, 300000);
+        }
+      });
+    };
+    connect();
+  }
+
+  // Sign and unsign in one request (PUT / DELETE) instead of post + redirect + reload
+  if (form && window.fetch) {
+    const button = form.querySelector("button");
+    form.addEventListener("submit", async (event) => {
+      event.preventDefault();
+      button.disabled = true;
+      try {
+        const response = await fetch(form.dataset.signatureUrl, {
+          method: button.name === "sign" ? "PUT" : "DELETE",
+          headers: { Accept: "application/json" },
+        });
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+        const state = await response.json();
+        count.textContent = state.signatures;
+        button.name = state.signed ? "unsign" : "sign";
+        button.textContent = state.signed ? form.dataset.unsignLabel : form.dataset.signLabel;
+        button.disabled = false;
+      } catch (error) {
+        // Fall back to the plain form post; the server renders the outcome
+        // (e.g. a closed initiative or an expired session)
+        const field = document.createElement("input");
+        field.type = "hidden";
+        field.name = button.name;
+        form.append(field);
+        form.submit();
+      }
+    });
+  }
+})();
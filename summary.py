@@ -0,0 +1,69 @@
+import db
+
+# Rollup rows are per hour; the window start is truncated to the same format
+WINDOW_START = "strftime('%Y-%m-%d %H:00:00', 'now', ?)"
+
+HOURLY_SQL = f"""
+    SELECT hour, SUM(count) AS signatures
+    FROM signature_rollups
+    WHERE hour >= {WINDOW_START}
+    GROUP BY hour
+    ORDER BY hour
+"""
+
+INITIATIVE_HOURLY_SQL = f"""
+    SELECT hour, count AS signatures
+    FROM signature_rollups
+    WHERE initiative_id = ? AND hour >= {WINDOW_START}
+    ORDER BY hour
+"""
+
+TOP_SQL = f"""
+    SELECT r.initiative_id AS id, i.title, SUM(r.count) AS signatures
+    FROM signature_rollups r
+    JOIN initiatives i ON i.id = r.initiative_id
+    WHERE r.hour >= {WINDOW_START} AND i.deleted = 0
+    GROUP BY r.initiative_id
+    ORDER BY signatures DESC, id
+    LIMIT ?
+"""
+
+
+def summarize(days=30, initiative_id=None, bucket="day", top=10):
+    """Allekirjoitusten yhteenveto viimeisiltä `days` päivältä tuntitaulusta.
+
+    Aikasarja (päivä tai tunti), määrät, vilkkain tunti ja (koko palvelulle)
+    eniten allekirjoituksia saaneet aloitteet. Lukee enintään 24 riviä
+    päivää kohden eikä koske signatures-tauluun.
+    """
+    window = f"-{int(days)} days"
+    if initiative_id is None:
+        hourly = db.query(HOURLY_SQL, [window])
+        total = db.query(
+            "SELECT COALESCE(SUM(signature_count), 0) AS n FROM initiatives WHERE deleted = 0"
+        )[0]["n"]
+    else:
+        hourly = db.query(INITIATIVE_HOURLY_SQL, [initiative_id, window])
+        total = db.query(
+            "SELECT signature_count AS n FROM initiatives WHERE id = ?", [initiative_id]
+        )[0]["n"]
+
+    series = {}
+    for row in hourly:
+        key = row["hour"] if bucket == "hour" else row["hour"][:10]
+        series[key] = series.get(key, 0) + row["signatures"]
+    peak = max(hourly, key=lambda row: (row["signatures"], row["hour"]), default=None)
+
+    result = {
+        "days": int(days),
+        "bucket": bucket,
+        "series": [{"bucket": key, "signatures": n} for key, n in series.items()],
+        "totals": {
+            "window": sum(series.values()),
+            "all_time": total,
+        },
+        "peak_hour": dict(hour=peak["hour"], signatures=peak["signatures"]) if peak else None,
+    }
+    if initiative_id is None:
+        result["top_initiatives"] = [dict(row) for row in db.query(TOP_SQL, [window, top])]
+    return result
@@ -0,0 +1,16 @@
+"""WSGI entry point for production servers.
+
+    FLASK_SECRET_KEY=... gunicorn -c gunicorn.conf.py
+
+Settings come from FLASK_* environment variables or the Python file named by
+FLASK_CONFIG_FILE (see app.create_app). Every worker and every node must
+sign sessions with the same key, so a missing SECRET_KEY is an error here
+instead of a random per-process key.
+"""
+import os
+
+os.environ.setdefault("FLASK_REQUIRE_SECRET_KEY", "true")
+
+from app import app  # noqa: E402
+
+application = app